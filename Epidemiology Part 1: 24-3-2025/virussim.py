@@ -3,11 +3,83 @@ import matplotlib.pyplot as plt
 import random
 import time
 import os
+import sys
+import logging
 from typing import List, Dict, Tuple, Union, Callable
 import pandas as pd
 import copy
-
-
+import numpy as np
+
+
+# Status codes of the node state store
+HEALTHY, SICK, RECOVERED, DEAD = range(4)
+STATUSES: List[str] = ['healthy', 'sick', 'recovered', 'dead']
+# Time series kept in VirusSimulation.stats, one value per day
+STATS: List[str] = STATUSES + ['vaccinated', 'immunocompromised_alive', 'immunocompromised_dead',
+                               'vaccinated_alive', 'vaccinated_dead']
+
+
+def unique_ids(ids: np.ndarray) -> np.ndarray:
+    """The distinct values of an array of node ids, sorted."""
+    ids = np.sort(ids)
+    first = np.ones(len(ids), dtype=bool)
+    first[1:] = ids[1:] != ids[:-1]
+    return ids[first]
+
+
+def gather_neighbors(indptr: np.ndarray, indices: np.ndarray, nodes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The contacts of some nodes from CSR arrays.
+
+    Returns the degree of each node and all of their neighbors, each node's
+    neighbors following the previous node's.
+    """
+    starts = indptr[nodes]
+    degrees = indptr[nodes + 1] - starts
+    offsets = np.repeat(starts - np.cumsum(degrees) + degrees, degrees)
+    return degrees, indices[offsets + np.arange(len(offsets))]
+
+
+def gnp_csr(n: int, p: float, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Draw an Erdos-Renyi G(n, p) graph straight into CSR arrays.
+
+    The number of edges is Binomial(n(n-1)/2, p) and the edges themselves a
+    uniform choice of that many distinct pairs, which is the same
+    distribution nx.fast_gnp_random_graph() samples from, without building
+    networkx objects.
+
+    Parameters
+    ----------
+    n : int
+        The number of nodes.
+    p : float
+        The probability of each edge.
+    rng : np.random.Generator
+        The random source.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        indptr and indices: the neighbors of node i are
+        indices[indptr[i]:indptr[i + 1]].
+    """
+    pairs = n * (n - 1) // 2
+    edges = rng.binomial(pairs, p)
+    chosen = np.empty(0, dtype=np.int64)
+    while len(chosen) < edges:
+        # Draw with replacement and drop repeats until there are enough
+        chosen = unique_ids(np.concatenate([chosen, rng.integers(0, pairs, size=edges - len(chosen))]))
+    # Pair index k is (i, j) with j < i and k = i(i-1)/2 + j
+    i = ((1 + np.sqrt(1 + 8 * chosen.astype(np.float64))) // 2).astype(np.int64)
+    i[i * (i - 1) // 2 > chosen] -= 1
+    i[(i + 1) * i // 2 <= chosen] += 1
+    j = chosen - i * (i - 1) // 2
+    # Both directions of every edge, sorted by source then target
+    keys = np.sort(np.concatenate([i * n + j, j * n + i]))
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys // n, minlength=n), out=indptr[1:])
+    return indptr, (keys % n).astype(np.int32)
 
 
 class VirusSimulation:
@@ -46,11 +118,16 @@ class VirusSimulation:
                 The probability of a person recovering from the virus.
             - 'Vaccine function': Callable[[int], int], default lambda x: 0
                 The function to determine the number of vaccines given at each step.
+            - 'engine': str, default 'python'
+                'python' steps through people and contacts one at a time,
+                'vectorized' keeps the contacts as CSR arrays and draws every
+                death, recovery and transmission of a day in NumPy at once.
 
         Initializes the simulation graph and statistics.
         """
 
-        print("Initializing default simulation")
+        if debug:
+            print("Initializing default simulation")
         self.name = config.get('name', "default")
         self.N: int = config.get('N', 1000)
         self.Pn: float = config.get('Pn', 0.02)
@@ -66,14 +143,12 @@ class VirusSimulation:
         self.Pr: float = config.get('Pr', 0.1)
         self.vacfunc: Callable[[int], int] = config.get('Vaccine function', lambda step: 0)
         self.Pn: float = config.get('Pn', 0.02)
+        self.engine: str = config.get('engine', 'python')
+        if self.engine not in ('python', 'vectorized'):
+            raise ValueError(f"Unknown engine {self.engine!r}")
         self.initialize_simulation(debug)
-        self.stats: dict[str, list[int]] = {
-            'healthy': [self.N - self.initial_infected],
-            'sick': [self.initial_infected],
-            'recovered': [0],
-            'vaccinated': [0],
-            'dead': [0]
-        }
+        self.stats: dict[str, list[int]] = {key: [] for key in STATS}
+        self.record_stats()
         self.steps: int = 0
         if debug:
             print(f"Simulation started with {self.N} people and {self.initial_infected} initial infections")
@@ -93,15 +168,26 @@ class VirusSimulation:
 
     def initialize_simulation(self, debug = False) -> None:
         """
-        Initializes the simulation graph and attributes for each node.
+        Initializes the simulation graph and the state of each node.
 
         The graph is generated using the Erdos-Renyi model with the given
-        parameters. Each node is then assigned the following attributes:
-        - 'status': Literal['healthy', 'sick', 'recovered', 'dead']
-        - 'immunocompromised': bool
-        - 'asymptomatic': bool
-        - 'vaccinated': bool
-        - 'masked': bool
+        parameters, as a networkx graph for the python engine and as CSR
+        arrays (self.indptr, self.indices) for the vectorized one. Node state
+        is kept in NumPy columns indexed by node id rather than in networkx
+        attribute dicts:
+        - self.status: uint8 array of HEALTHY, SICK, RECOVERED or DEAD
+        - self.immunocompromised: bool array
+        - self.asymptomatic: bool array
+        - self.vaccinated: bool array
+        - self.masked: bool array
+        - self.sick: sorted array of the ids of everyone currently sick, so
+          a day's work scales with the outbreak rather than with N
+
+        Totals are kept up to date by apply_transitions() and vaccinate()
+        instead of being recounted each day:
+        - self.counts: number of people with each status code
+        - self.vaccinated_total, self.immunocompromised_total
+        - self.vaccinated_dead, self.immunocompromised_dead
 
         The initial infected nodes are randomly selected.
         """
@@ -109,28 +195,99 @@ class VirusSimulation:
             print("Initializing simulation with the following parameters:")
             print(f"Population: {self.N}")
             print(f"Probability of random connection: {self.Pn}")
-        self.graph = nx.fast_gnp_random_graph(self.N, self.Pn)
-        for node in self.graph.nodes():
-            # add code hereto show initilaizing nodes:
-            self.graph.nodes[node]['status'] = 'healthy'
-            self.graph.nodes[node]['immunocompromised'] = random.random() < self.Pi
-            self.graph.nodes[node]['asymptomatic'] = not self.graph.nodes[node]['immunocompromised'] and random.random() < self.Pa
-            
-            #if immuno compromised, 20% chance of being vaccinated
-            if self.graph.nodes[node]['immunocompromised']:
-                self.graph.nodes[node]['vaccinated'] = random.random() < self.Pv * 0.2
-            else:
-                self.graph.nodes[node]['vaccinated'] = random.random() < self.Pv
-            
-
-            self.graph.nodes[node]['masked'] = random.random() < self.Pm
-            #print(f"Node {node} is {self.graph.nodes[node]}")
-
-        for node in random.sample(list(self.graph.nodes()), self.initial_infected):
-            self.graph.nodes[node]['status'] = 'sick'
+        # Seeded from the random module, so random.seed() still fixes a run
+        self.rng = np.random.default_rng(random.getrandbits(64))
+        self.graph = None
+        self.indptr = self.indices = None
+        if self.engine == 'vectorized':
+            self.indptr, self.indices = gnp_csr(self.N, self.Pn, self.rng)
+        else:
+            self.graph = nx.fast_gnp_random_graph(self.N, self.Pn)
+            # The same contacts as CSR arrays, in the graph's neighbor order,
+            # so python_step() can gather a day's contacts at once
+            neighbors = [list(self.graph.adj[node]) for node in range(self.N)]
+            self.indptr = np.zeros(self.N + 1, dtype=np.int64)
+            np.cumsum([len(contacts) for contacts in neighbors], out=self.indptr[1:])
+            self.indices = np.array([contact for contacts in neighbors for contact in contacts], dtype=np.int64)
+        self.status = np.full(self.N, HEALTHY, dtype=np.uint8)
+        self.immunocompromised = self.rng.random(self.N) < self.Pi
+        self.asymptomatic = ~self.immunocompromised & (self.rng.random(self.N) < self.Pa)
+        #if immuno compromised, 20% chance of being vaccinated
+        self.vaccinated = self.rng.random(self.N) < np.where(self.immunocompromised, self.Pv * 0.2, self.Pv)
+        self.masked = self.rng.random(self.N) < self.Pm
+
+        self.sick = np.sort(np.array(random.sample(range(self.N), self.initial_infected), dtype=np.int64))
+        self.status[self.sick] = SICK
+
+        self.counts = np.bincount(self.status, minlength=len(STATUSES))
+        self.vaccinated_total = int(self.vaccinated.sum())
+        self.immunocompromised_total = int(self.immunocompromised.sum())
+        self.vaccinated_dead = 0
+        self.immunocompromised_dead = 0
         if debug:
             print("Simulation initialized")
 
+    def apply_transitions(self, deaths: np.ndarray, recoveries: np.ndarray, infections: np.ndarray) -> np.ndarray:
+        """
+        Applies a day's deaths, recoveries and infections to the node state,
+        updating the totals by the people that changed.
+
+        Parameters
+        ----------
+        deaths, recoveries : np.ndarray
+            Ids of sick people who die or recover.
+        infections : np.ndarray
+            Ids of healthy or recovered people who catch the virus, possibly
+            repeated.
+
+        Returns
+        -------
+        np.ndarray
+            The ids of the newly infected, sorted and without repeats.
+        """
+        deaths = np.asarray(deaths, dtype=np.int64)
+        recoveries = np.asarray(recoveries, dtype=np.int64)
+        infections = unique_ids(np.asarray(infections, dtype=np.int64))
+
+        self.counts[SICK] -= len(deaths) + len(recoveries)
+        self.counts[DEAD] += len(deaths)
+        self.counts[RECOVERED] += len(recoveries)
+        self.counts -= np.bincount(self.status[infections], minlength=len(STATUSES))
+        self.counts[SICK] += len(infections)
+        self.vaccinated_dead += int(self.vaccinated[deaths].sum())
+        self.immunocompromised_dead += int(self.immunocompromised[deaths].sum())
+
+        self.status[deaths] = DEAD
+        self.status[recoveries] = RECOVERED
+        self.status[infections] = SICK
+        return infections
+
+    def vaccinate(self, nodes: np.ndarray) -> None:
+        """
+        Vaccinates the given people, updating the vaccinated totals.
+
+        Parameters
+        ----------
+        nodes : np.ndarray
+            Ids of the people to vaccinate. Anyone already vaccinated is
+            left as they are.
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        nodes = nodes[~self.vaccinated[nodes]]
+        self.vaccinated_total += len(nodes)
+        self.vaccinated_dead += int((self.status[nodes] == DEAD).sum())
+        self.vaccinated[nodes] = True
+
+    def record_stats(self) -> None:
+        """Appends the current totals to each of the time series in self.stats."""
+        for name, count in zip(STATUSES, self.counts.tolist()):
+            self.stats[name].append(count)
+        self.stats['vaccinated'].append(self.vaccinated_total)
+        self.stats['immunocompromised_alive'].append(self.immunocompromised_total - self.immunocompromised_dead)
+        self.stats['immunocompromised_dead'].append(self.immunocompromised_dead)
+        self.stats['vaccinated_alive'].append(self.vaccinated_total - self.vaccinated_dead)
+        self.stats['vaccinated_dead'].append(self.vaccinated_dead)
+
     def calculate_death_probability(self, node: int) -> float:
         """
         Calculates the probability of a given node dying.
@@ -150,11 +307,11 @@ class VirusSimulation:
             The probability of the given node dying.
         """
         pk: float = self.Pk
-        if self.graph.nodes[node]['immunocompromised']:
+        if self.immunocompromised[node]:
             pk *= 5
-        if self.graph.nodes[node]['vaccinated']:
+        if self.vaccinated[node]:
             pk /= 10
-        if self.graph.nodes[node]['asymptomatic']:
+        if self.asymptomatic[node]:
             pk /= 2
         return min(pk, 1.0)
 
@@ -177,15 +334,15 @@ class VirusSimulation:
             The probability of the given node recovering.
         """
         pr: float = self.Pr
-        if self.graph.nodes[node]['immunocompromised']:
+        if self.immunocompromised[node]:
             pr /= 3
-        if self.graph.nodes[node]['vaccinated']:
+        if self.vaccinated[node]:
             pr *= 5
         return min(pr, 1.0)
 
     def step(self, step: int, debug: bool = False) -> bool:
         """
-        Advances the simulation by one step.
+        Advances the simulation by one step, with the configured engine.
 
         Parameters
         ----------
@@ -199,74 +356,147 @@ class VirusSimulation:
         bool
             Whether there are still sick individuals.
         """
+        if self.engine == 'vectorized':
+            new_infections = self.vectorized_step(step)
+        else:
+            new_infections = self.python_step(step)
+        # Deaths and recoveries leave the frontier, new infections join it
+        sick = unique_ids(np.concatenate([self.sick, new_infections]))
+        self.sick = sick[self.status[sick] == SICK]
+        self.record_stats()
+        return self.counts[SICK] > 0
+
+    def python_step(self, step: int) -> np.ndarray:
+        """
+        Applies one day's deaths, recoveries, infections and vaccinations,
+        visiting each sick person and each of their contacts in turn.
+
+        Parameters
+        ----------
+        step : int
+            The current step number.
+
+        Returns
+        -------
+        np.ndarray
+            The ids of the newly infected.
+        """
         x: int = self.vacfunc(step)
         new_infections: List[int] = []
         new_recoveries: List[int] = []
         new_deaths: List[int] = []
         new_vaccinations: List[int] = []
 
-        for node in self.graph.nodes():
-            if self.graph.nodes[node]['status'] == 'sick':
-
-                if random.random() < self.calculate_death_probability(node):
-                    new_deaths.append(node)
-                elif random.random() < self.calculate_recovery_probability(node):
-                    new_recoveries.append(node)
-                
-                else:
-                    for neighbor in self.graph.neighbors(node):
-                        if self.graph.nodes[neighbor]['status'] == 'healthy' or self.graph.nodes[neighbor]['status'] == 'recovered':
-                            spread_prob: float = self.Pu
-                            if self.graph.nodes[node]['vaccinated']:
-                                spread_prob /= 2
-                            if self.graph.nodes[neighbor]['status'] == 'recovered':
-                                spread_prob /= 1000
-                            if self.graph.nodes[node]['asymptomatic']:
-                                spread_prob /= 2
-                            if self.graph.nodes[node]['masked']:
-                                if random.random() < self.mask_effectiveness:
-                                    continue
-                            if self.graph.nodes[neighbor]['masked']:
-                                if random.random() < self.mask_effectiveness:
-                                    continue
-                            if random.random() < spread_prob and random.random() < self.Pc:
-                                new_infections.append(neighbor)
-        new_vaccinations = random.sample(
-            [node for node in self.graph.nodes()
-             if not (self.graph.nodes[node]['vaccinated'] and self.graph.nodes[node]['status'] != 'dead')],
-            x)
-
-        for node in new_deaths:
-            self.graph.nodes[node]['status'] = 'dead'
-        for node in new_recoveries:
-            self.graph.nodes[node]['status'] = 'recovered'
-        for node in new_infections:
-            self.graph.nodes[node]['status'] = 'sick'
-        for node in new_vaccinations:
-            self.graph.nodes[node]['vaccinated'] = True
-
-        current_status: Dict[str, int] = {
-            'healthy': 0,
-            'sick': 0,
-            'recovered': 0,
-            'dead': 0,
-            'vaccinated': 0
-        }
-        for node in self.graph.nodes():
-            current_status[self.graph.nodes[node]['status']] += 1
-            if self.graph.nodes[node]['vaccinated']:
-                current_status['vaccinated'] += 1
-
-        self.stats['healthy'].append(current_status['healthy'])
-        self.stats['sick'].append(current_status['sick'])
-        self.stats['vaccinated'].append(current_status['vaccinated'])
-        self.stats['recovered'].append(current_status['recovered'])
-        self.stats['dead'].append(current_status['dead'])
+        # Flags are read only for sick people and their contacts, gathered
+        # once a day into plain lists, which index faster than arrays one
+        # element at a time, so a day costs nothing for the rest of the
+        # population
+        degrees, contacts = gather_neighbors(self.indptr, self.indices, self.sick)
+        sick: List[int] = self.sick.tolist()
+        contact_ids: List[int] = contacts.tolist()
+        contact_status: List[int] = self.status[contacts].tolist()
+        contact_masked: List[bool] = self.masked[contacts].tolist()
+        vaccinated: List[bool] = self.vaccinated[self.sick].tolist()
+        asymptomatic: List[bool] = self.asymptomatic[self.sick].tolist()
+        masked: List[bool] = self.masked[self.sick].tolist()
+
+        start = 0
+        for i, (node, degree) in enumerate(zip(sick, degrees.tolist())):
+            first, start = start, start + degree
+            if random.random() < self.calculate_death_probability(node):
+                new_deaths.append(node)
+            elif random.random() < self.calculate_recovery_probability(node):
+                new_recoveries.append(node)
+            
+            else:
+                for neighbor, status, neighbor_masked in zip(contact_ids[first:start], contact_status[first:start],
+                                                             contact_masked[first:start]):
+                    if status == HEALTHY or status == RECOVERED:
+                        spread_prob: float = self.Pu
+                        if vaccinated[i]:
+                            spread_prob /= 2
+                        if status == RECOVERED:
+                            spread_prob /= 1000
+                        if asymptomatic[i]:
+                            spread_prob /= 2
+                        if masked[i]:
+                            if random.random() < self.mask_effectiveness:
+                                continue
+                        if neighbor_masked:
+                            if random.random() < self.mask_effectiveness:
+                                continue
+                        if random.random() < spread_prob and random.random() < self.Pc:
+                            new_infections.append(neighbor)
+        if x:
+            new_vaccinations = random.sample(
+                np.flatnonzero(~(self.vaccinated & (self.status != DEAD))).tolist(),
+                x)
+
+        new_infections = self.apply_transitions(new_deaths, new_recoveries, new_infections)
+        self.vaccinate(new_vaccinations)
+        return new_infections
+
+    def vectorized_step(self, step: int) -> np.ndarray:
+        """
+        Applies one day's deaths, recoveries, infections and vaccinations as
+        vectorized Bernoulli draws.
+
+        Each sick person dies, else recovers, else spreads, with the same
+        probabilities as python_step(). A contact is infected along an edge
+        with probability Pu * Pc, halved if the sick person is vaccinated and
+        again if asymptomatic, divided by 1000 if the contact has recovered
+        and times (1 - mask_effectiveness) for each of the two who is masked;
+        python_step() draws those same factors one after another. The edges
+        of every spreading person are gathered from the CSR arrays and drawn
+        at once.
 
-        if debug: time.sleep(0.01)
-        return current_status['sick'] > 0
+        Parameters
+        ----------
+        step : int
+            The current step number.
 
-    def run_simulation(self, max_steps: int = 100, iteration: int = 0, step: int = 0, debug: bool = False) -> Tuple[int, Dict[str, List[int]]]:
+        Returns
+        -------
+        np.ndarray
+            The ids of the newly infected.
+        """
+        x: int = self.vacfunc(step)
+        sick = self.sick
+
+        pk = np.full(len(sick), self.Pk)
+        pk[self.immunocompromised[sick]] *= 5
+        pk[self.vaccinated[sick]] /= 10
+        pk[self.asymptomatic[sick]] /= 2
+        pr = np.full(len(sick), self.Pr)
+        pr[self.immunocompromised[sick]] /= 3
+        pr[self.vaccinated[sick]] *= 5
+        dies = self.rng.random(len(sick)) < np.minimum(pk, 1.0)
+        recovers = ~dies & (self.rng.random(len(sick)) < np.minimum(pr, 1.0))
+        spreaders = sick[~dies & ~recovers]
+
+        # Gather every edge out of a spreader
+        degrees, targets = gather_neighbors(self.indptr, self.indices, spreaders)
+        sources = np.repeat(spreaders, degrees)
+        target_status = self.status[targets]
+        susceptible = (target_status == HEALTHY) | (target_status == RECOVERED)
+        sources, targets, target_status = sources[susceptible], targets[susceptible], target_status[susceptible]
+
+        spread_prob = np.full(len(sources), self.Pu * self.Pc)
+        spread_prob[self.vaccinated[sources]] /= 2
+        spread_prob[target_status == RECOVERED] /= 1000
+        spread_prob[self.asymptomatic[sources]] /= 2
+        spread_prob[self.masked[sources]] *= 1 - self.mask_effectiveness
+        spread_prob[self.masked[targets]] *= 1 - self.mask_effectiveness
+        new_infections = targets[self.rng.random(len(targets)) < spread_prob]
+
+        new_infections = self.apply_transitions(sick[dies], sick[recovers], new_infections)
+        if x:
+            candidates = np.flatnonzero(~(self.vaccinated & (self.status != DEAD)))
+            self.vaccinate(self.rng.choice(candidates, x, replace=False))
+        return new_infections
+
+    def run_simulation(self, max_steps: int = 100, iteration: int = 0, step: int = 0, debug: bool = False,
+                       observer: 'ProgressObserver' = None) -> Tuple[int, Dict[str, List[int]]]:
         """
         Run the simulation for the given number of steps.
 
@@ -280,16 +510,19 @@ class VirusSimulation:
             The current step number (used for printing progress)
         debug : bool
             Whether to print detailed progress information
+        observer : ProgressObserver, optional
+            Told about each day as it is simulated. Defaults to the
+            interactive DashboardObserver; NullObserver runs headless.
 
         Returns
         -------
         Tuple[int, Dict[str, List[int]]]
             A tuple containing the final step number and the simulation statistics
         """
+        observer = DashboardObserver() if observer is None else observer
         while step < max_steps and self.step(step, debug):
             step += 1
-            self.print_progress(step, iteration)
-            time.sleep(0.01)  # Add a small delay to make the progress visible
+            observer.day(self, step, iteration)
         self.steps = step
         return step, self.stats
 
@@ -304,7 +537,6 @@ class VirusSimulation:
         iteration : int
             The current iteration number
         """
-        os.system('cls' if os.name == 'nt' else 'clear')  # Clear console
         print(f"Iteration: {iteration}")
         print(f"Name: {self.name}")
         print(f"Day: {day}")
@@ -349,44 +581,53 @@ class VirusSimulation:
 
         Parameters
         ----------
-        steps : int
-            The number of steps the simulation took
-        stats : Dict[str, List[int]]
-            The simulation statistics
-        config : Dict[str, Union[int, float]]
-            The simulation configuration
+        i : int, optional
+            The iteration number, if the simulation is one of several
 
         Returns
         -------
         Dict[str, Union[int, float]]
-            The final simulation statistics
+            The final simulation statistics, as final_report() gives them
         """
-        if not self.stats:
-            raise ValueError("No simulation statistics found")
-        if not self.graph:
-            raise ValueError("No simulation graph found")
-
-        # clear the console
-        os.system('cls' if os.name == 'nt' else 'clear')
+        final_stats = self.final_report()
         print("Iteration: ", i if i is not None else "Final")
         print("Final Report:")
         print(f"Simulation completed in {self.steps} days")
         print(f"Final Counts:")
-        print(f"Healthy: {self.stats['healthy'][-1]}")
-        print(f"Sick: {self.stats['sick'][-1]}")
-        print(f"Vaccinated: {self.stats['vaccinated'][-1]}")
-        print(f"Recovered: {self.stats['recovered'][-1]}")
-        print(f"Deaths: {self.stats['dead'][-1]}")
-        print(f"Percentage survived: {(self.stats['recovered'][-1] + self.stats['healthy'][-1]) / self.N * 100:.2f}%")
-        print(f"Percentage died: {self.stats['dead'][-1] / self.N * 100:.2f}%")
-        print(f"Percentage untouched: {self.stats['healthy'][-1] / self.N * 100:.2f}%")
-
-        immunocompromised_survived = sum(1 for node in self.graph.nodes() if self.graph.nodes[node].get('immunocompromised', False) and self.graph.nodes[node]['status'] != 'dead')
-        print(f"Percentage of immunocompromised people survived: {immunocompromised_survived / (sum(1 for node in self.graph.nodes() if self.graph.nodes[node].get('immunocompromised', False)) or 1) * 100:.2f}%")
-        vaccinated_survived = sum(1 for node in self.graph.nodes() if self.graph.nodes[node].get('vaccinated', False) and self.graph.nodes[node]['status'] != 'dead')
-        print(f"Percentage of vaccinated people survived: {vaccinated_survived / (sum(1 for node in self.graph.nodes() if self.graph.nodes[node].get('vaccinated', False)) or 1) * 100:.2f}%")
-        unvaccinated_survived = sum(1 for node in self.graph.nodes() if not self.graph.nodes[node].get('vaccinated', False) and self.graph.nodes[node]['status'] != 'dead')
-        print(f"Percentage of unvaccinated people survived: {unvaccinated_survived / (sum(1 for node in self.graph.nodes() if not self.graph.nodes[node].get('vaccinated', False)) or 1) * 100:.2f}%")
+        print(f"Healthy: {final_stats['healthy']}")
+        print(f"Sick: {final_stats['sick']}")
+        print(f"Vaccinated: {final_stats['vaccinated']}")
+        print(f"Recovered: {final_stats['recovered']}")
+        print(f"Deaths: {final_stats['dead']}")
+        print(f"Percentage survived: {final_stats['percentage_survived']:.2f}%")
+        print(f"Percentage died: {final_stats['percentage_died']:.2f}%")
+        print(f"Percentage untouched: {final_stats['percentage_untouched']:.2f}%")
+        print(f"Percentage of immunocompromised people survived: {final_stats['percentage_immunocompromised_survived']:.2f}%")
+        print(f"Percentage of vaccinated people survived: {final_stats['percentage_vaccinated_survived']:.2f}%")
+        print(f"Percentage of unvaccinated people survived: {final_stats['percentage_unvaccinated_survived']:.2f}%")
+        return final_stats
+
+    def final_report(self) -> Dict[str, Union[int, float]]:
+        """
+        The final statistics of the simulation, without printing anything.
+
+        Returns
+        -------
+        Dict[str, Union[int, float]]
+            The final counts, survival percentages overall and by subgroup,
+            and the number of steps taken
+        """
+        if not self.stats:
+            raise ValueError("No simulation statistics found")
+        if self.graph is None and self.indptr is None:
+            raise ValueError("No simulation graph found")
+
+        immunocompromised_total = self.immunocompromised_total
+        vaccinated_total = self.vaccinated_total
+        unvaccinated_total = self.N - vaccinated_total
+        immunocompromised_survived = self.stats['immunocompromised_alive'][-1]
+        vaccinated_survived = self.stats['vaccinated_alive'][-1]
+        unvaccinated_survived = unvaccinated_total - (self.stats['dead'][-1] - self.stats['vaccinated_dead'][-1])
 
         final_stats = {
             'steps': self.steps,
@@ -397,9 +638,9 @@ class VirusSimulation:
             'percentage_survived': (self.stats['recovered'][-1] + self.stats['healthy'][-1]) / self.N * 100,
             'percentage_died': self.stats['dead'][-1] / self.N * 100,
             'percentage_untouched': self.stats['healthy'][-1] / self.N * 100,
-            'percentage_immunocompromised_survived': immunocompromised_survived / (sum(1 for node in self.graph.nodes() if self.graph.nodes[node].get('immunocompromised', False)) or 1) * 100,
-            'percentage_vaccinated_survived': vaccinated_survived / (sum(1 for node in self.graph.nodes() if self.graph.nodes[node].get('vaccinated', False)) or 1) * 100,
-            'percentage_unvaccinated_survived': unvaccinated_survived / (sum(1 for node in self.graph.nodes() if not self.graph.nodes[node].get('vaccinated', False)) or 1) * 100,
+            'percentage_immunocompromised_survived': immunocompromised_survived / (immunocompromised_total or 1) * 100,
+            'percentage_vaccinated_survived': vaccinated_survived / (vaccinated_total or 1) * 100,
+            'percentage_unvaccinated_survived': unvaccinated_survived / (unvaccinated_total or 1) * 100,
             'vaccinated': self.stats['vaccinated'][-1]
         }
         return final_stats
@@ -423,8 +664,169 @@ config = {
 '''
 
 
-def runmultisim(config, num_simulations, debug=False):
-    print("Initializing simulation")
+class ProgressObserver:
+    """
+    Receives the progress of simulations run by run_simulation() and
+    runmultisim().
+
+    Every method does nothing here; subclasses override the ones they want.
+    """
+
+    def started(self, name: str, num_simulations: int) -> None:
+        """Called by runmultisim() before it runs num_simulations simulations of the named config."""
+
+    def day(self, sim: VirusSimulation, day: int, iteration: int) -> None:
+        """Called after each simulated day, once sim.stats has been updated."""
+
+    def finished(self, sim: VirusSimulation, final_stats: Dict[str, Union[int, float]], iteration: int) -> None:
+        """Called when a simulation ends, with its final_report()."""
+
+    def summary(self, total_stats: Dict[str, List[float]]) -> None:
+        """Called by runmultisim() with the final statistics of every simulation it ran."""
+
+
+class NullObserver(ProgressObserver):
+    """Reports nothing, for headless batch runs."""
+
+
+def progress_line(sim: VirusSimulation, day: int, iteration: int) -> str:
+    """A one-line summary of a simulation's current counts."""
+    stats = sim.stats
+    return (f"{sim.name} iteration {iteration} day {day}: healthy {stats['healthy'][-1]}, "
+            f"sick {stats['sick'][-1]}, recovered {stats['recovered'][-1]}, dead {stats['dead'][-1]}, "
+            f"vaccinated {stats['vaccinated'][-1]}")
+
+
+def summary_lines(total_stats: Dict[str, List[float]]) -> List[str]:
+    """The average of each final statistic over several simulations, one line each."""
+    lines = []
+    for key, value in total_stats.items():
+        if "percentage" in key:
+            lines.append(f"{key}: {sum(value)/len(value):.2f}%")
+        else:
+            lines.append(f"{key}: {sum(value)/len(value):.2f}")
+    return lines
+
+
+class DashboardObserver(ProgressObserver):
+    """
+    The interactive display: the console is cleared and the full status
+    reprinted every day, with a short pause so it can be followed.
+
+    Parameters
+    ----------
+    delay : float
+        Seconds to pause after drawing each day.
+    """
+
+    def __init__(self, delay: float = 0.01) -> None:
+        self.delay = delay
+
+    def started(self, name: str, num_simulations: int) -> None:
+        print("Initializing simulation")
+
+    def clear(self) -> None:
+        os.system('cls' if os.name == 'nt' else 'clear')
+
+    def day(self, sim: VirusSimulation, day: int, iteration: int) -> None:
+        self.clear()
+        sim.print_progress(day, iteration)
+        time.sleep(self.delay)  # Add a small delay to make the progress visible
+
+    def finished(self, sim: VirusSimulation, final_stats: Dict[str, Union[int, float]], iteration: int) -> None:
+        self.clear()
+        sim.print_final_report(i=iteration)
+
+    def summary(self, total_stats: Dict[str, List[float]]) -> None:
+        self.clear()
+        for line in summary_lines(total_stats):
+            print(line)
+        print("Simulation completed")
+
+
+class TerminalObserver(ProgressObserver):
+    """
+    Prints a one-line status at most once per interval, and a line for each
+    finished simulation, without clearing the console.
+
+    Parameters
+    ----------
+    interval : float
+        Minimum seconds between progress lines.
+    stream : file-like, optional
+        Where to write. Defaults to sys.stdout.
+    """
+
+    def __init__(self, interval: float = 1.0, stream=None) -> None:
+        self.interval = interval
+        self.stream = stream
+        self.last = float('-inf')
+
+    def write(self, line: str) -> None:
+        print(line, file=self.stream if self.stream is not None else sys.stdout, flush=True)
+
+    def started(self, name: str, num_simulations: int) -> None:
+        self.write(f"Running {num_simulations} simulations of {name}")
+
+    def day(self, sim: VirusSimulation, day: int, iteration: int) -> None:
+        now = time.monotonic()
+        if now - self.last >= self.interval:
+            self.last = now
+            self.write(progress_line(sim, day, iteration))
+
+    def finished(self, sim: VirusSimulation, final_stats: Dict[str, Union[int, float]], iteration: int) -> None:
+        self.write(f"{sim.name} iteration {iteration} finished in {final_stats['steps']} days: "
+                   f"{final_stats['percentage_died']:.2f}% died, "
+                   f"{final_stats['percentage_untouched']:.2f}% untouched")
+
+    def summary(self, total_stats: Dict[str, List[float]]) -> None:
+        for line in summary_lines(total_stats):
+            self.write(line)
+        self.write("Simulation completed")
+
+
+class LogObserver(ProgressObserver):
+    """
+    Reports through the logging module: a progress line every few days, one
+    per finished simulation and the averages at the end.
+
+    Parameters
+    ----------
+    every : int
+        Log progress every this many days. 0 logs only finished simulations.
+    logger : logging.Logger, optional
+        Defaults to this module's logger.
+    """
+
+    def __init__(self, every: int = 10, logger: logging.Logger = None) -> None:
+        self.every = every
+        self.logger = logging.getLogger(__name__) if logger is None else logger
+
+    def started(self, name: str, num_simulations: int) -> None:
+        self.logger.info("Running %d simulations of %s", num_simulations, name)
+
+    def day(self, sim: VirusSimulation, day: int, iteration: int) -> None:
+        if self.every and day % self.every == 0:
+            self.logger.info(progress_line(sim, day, iteration))
+
+    def finished(self, sim: VirusSimulation, final_stats: Dict[str, Union[int, float]], iteration: int) -> None:
+        self.logger.info("%s iteration %d finished: %s", sim.name, iteration, final_stats)
+
+    def summary(self, total_stats: Dict[str, List[float]]) -> None:
+        for line in summary_lines(total_stats):
+            self.logger.info(line)
+
+
+def runmultisim(config, num_simulations, debug=False, observer=None):
+    """
+    Run several simulations of one configuration and collect their final
+    statistics, with the average of each appended at the end.
+
+    observer, a ProgressObserver, is told about every day and every finished
+    simulation; it defaults to the interactive DashboardObserver.
+    """
+    observer = DashboardObserver() if observer is None else observer
+    observer.started(config.get('name', "default"), num_simulations)
     total_stats = {
         'steps': [],
         'healthy': [],
@@ -442,17 +844,12 @@ def runmultisim(config, num_simulations, debug=False):
     }
     for i in range(num_simulations):
         sim = VirusSimulation(config)
-        steps, stats = sim.run_simulation(max_steps=1000, iteration=i, debug=debug)
-        final_stats = sim.print_final_report(i = i)
+        steps, stats = sim.run_simulation(max_steps=1000, iteration=i, debug=debug, observer=observer)
+        final_stats = sim.final_report()
+        observer.finished(sim, final_stats, i)
         for key, value in final_stats.items():
             total_stats[key].append(value)
-    os.system('cls' if os.name == 'nt' else 'clear') # Clear console
-    for key, value in total_stats.items():
-        if "percentage" in key:
-            print(f"{key}: {sum(value)/len(value):.2f}%")
-        else:
-            print(f"{key}: {sum(value)/len(value):.2f}")
-    print("Simulation completed")
+    observer.summary(total_stats)
 
     # append average of each stat at the end
     for key, value in total_stats.items():
@@ -467,6 +864,7 @@ if __name__ == "__main__":
 
     defaultconfig = {
         "name": "default",
+        'engine': 'vectorized', # Draw each day in NumPy, see VirusSimulation.vectorized_step
         'N': 50000, # Number of people in the population
         'Pn': 0.0075, # Probability of a random connection between two people 
         'Pi': 0.01, # Probability of a person being immunocompromised
@@ -575,7 +973,7 @@ if __name__ == "__main__":
     for config in configs:
         name = config['name']
         print(f"Running {name}")
-        results = runmultisim(config, 30, debug=False)
+        results = runmultisim(config, 30, debug=False, observer=TerminalObserver(interval=5.0))
         df = pd.DataFrame(results)
         df.to_csv(f"{name}.csv", index=False)
         print(f"Done {name}")
@@ -1,38 +1,416 @@
-import random
+import hashlib
 import json
+import mmap
+import os
+import random
+from array import array
+from functools import lru_cache
+from itertools import accumulate, combinations
+from math import comb
+
+# Cards are small ints: card id = suit * 13 + rank, so ids 0-12 are the spades
+# 2..A, 13-25 the hearts and so on. A set of cards is a 52-bit mask with bit
+# `id` set, which makes (mask >> 13 * suit) & RANK_MASK the 13-bit rank mask
+# of one suit. The strings below are only used for display.
+SUITS = ['♠', '♥', '♦', '♣']
+RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', 'T', 'J', 'Q', 'K', 'A']
+SUIT_INDEX = {suit: i for i, suit in enumerate(SUITS)}
+RANK_INDEX = {rank: i for i, rank in enumerate(RANKS)}
+RANK_MASK = 0x1FFF
+WHEEL_MASK = 0x100F  # A, 2, 3, 4, 5
+
+# Hand categories, weakest first, so a category's index orders it
+HAND_NAMES = ["High Card", "Pair", "Two Pair", "Three of a Kind", "Straight",
+              "Flush", "Full House", "Four of a Kind", "Straight Flush"]
+CATEGORY_INDEX = {name: i for i, name in enumerate(HAND_NAMES)}
+
+
+def card_id(suit, rank):
+    return suit * 13 + rank
+
+
+def card_str(card):
+    return f"{RANKS[card % 13]}{SUITS[card // 13]}"
+
+
+SUIT_LETTERS = {'s': 0, 'h': 1, 'd': 2, 'c': 3}
+
+
+def parse_cards(text):
+    """Card ids from text like 'AsKh', 'As Kh' or 'A♠ K♥'."""
+    text = text.replace(' ', '').replace(',', '')
+    cards = []
+    for i in range(0, len(text), 2):
+        rank, suit = text[i].upper(), text[i + 1:i + 2]
+        suit = SUIT_INDEX.get(suit, SUIT_LETTERS.get(suit.lower()))
+        if rank not in RANK_INDEX or suit is None:
+            raise ValueError(f"Unknown card {text[i:i + 2]}")
+        cards.append(card_id(suit, RANK_INDEX[rank]))
+    return cards
+
+
+def straight_high(mask):
+    """Highest rank ending a straight in the 13-bit rank mask, or None."""
+    for high in range(12, 3, -1):
+        window = 0x1F << (high - 4)
+        if mask & window == window:
+            return high
+    if mask & WHEEL_MASK == WHEEL_MASK:
+        return 3
+    return None
+
+
+def straight_ranks(high):
+    if high == 3:
+        return [3, 2, 1, 0, 12]
+    return list(range(high, high - 5, -1))
+
+
+def top_ranks(mask, n=5):
+    """The n highest ranks set in a 13-bit rank mask, highest first."""
+    return [rank for rank in range(12, -1, -1) if mask >> rank & 1][:n]
+
+
+def classify(counts, flush_masks=()):
+    """
+    Classify a set of cards from its 13 rank counts and the rank masks of
+    any suits holding five or more cards.
+
+    Returns the hand name and the ranks of the best five cards, ordered
+    so that the cards that make the hand come before the kickers.
+    """
+    # Straight Flush
+    for mask in flush_masks:
+        high = straight_high(mask)
+        if high is not None:
+            return "Straight Flush", straight_ranks(high)
+
+    by_count = {4: [], 3: [], 2: [], 1: []}
+    rank_mask = 0
+    for rank in range(12, -1, -1):
+        if counts[rank]:
+            by_count[min(counts[rank], 4)].append(rank)
+            rank_mask |= 1 << rank
+
+    # Four of a Kind
+    if by_count[4]:
+        quads = by_count[4][0]
+        kicker = max(rank for rank in range(13) if counts[rank] and rank != quads)
+        return "Four of a Kind", [quads] * 4 + [kicker]
+
+    # Full House
+    if by_count[3]:
+        trips = by_count[3][0]
+        pairs = by_count[3][1:] + by_count[2]
+        if pairs:
+            return "Full House", [trips] * 3 + [max(pairs)] * 2
+
+    # Flush
+    if flush_masks:
+        return "Flush", top_ranks(flush_masks[0])
+
+    # Straight
+    high = straight_high(rank_mask)
+    if high is not None:
+        return "Straight", straight_ranks(high)
+
+    # Three of a Kind
+    if by_count[3]:
+        trips = by_count[3][0]
+        return "Three of a Kind", [trips] * 3 + by_count[1][:2]
+
+    # Two Pair and Pair
+    if len(by_count[2]) >= 2:
+        high_pair, low_pair = by_count[2][:2]
+        kicker = max(rank for rank in range(13)
+                     if counts[rank] and rank not in (high_pair, low_pair))
+        return "Two Pair", [high_pair] * 2 + [low_pair] * 2 + [kicker]
+    if by_count[2]:
+        pair = by_count[2][0]
+        return "Pair", [pair] * 2 + by_count[1][:3]
+
+    return "High Card", by_count[1][:5]
+
+
+def hand_key(name, ranks):
+    # (category, ranks) tuples sort in the same order as the hands they describe
+    return CATEGORY_INDEX[name], tuple(ranks)
+
+
+# Lookup tables
+#
+# Every 5 to 7 card hand is scored by the 5-card equivalence class of its best
+# five cards: an integer strength from 1 (7-5-4-3-2 offsuit) to 7462 (royal
+# flush), so strengths compare like the hands do. A hand with five or more
+# cards of one suit can't also make quads or a full house, so it is looked up
+# by that suit's 13-bit rank mask in FLUSH_TABLE. Anything else only depends
+# on its rank multiset, which is keyed by the sum of 5**rank over the cards
+# (a rank appears at most 4 times, so the base-5 digits never carry).
+RANK_KEY = [5 ** (card % 13) for card in range(52)]
+SUIT_NIBBLE = [1 << 4 * (card // 13) for card in range(52)]
+# (suit nibbles + 0x3333) & 0x8888 keeps the top bit of any suit count >= 5
+FLUSH_SHIFT = {0x8: 0, 0x80: 13, 0x800: 26, 0x8000: 39}
+
+
+def rank_patterns(size, rank=0):
+    """All rank count vectors of `size` cards, at most 4 of each rank."""
+    if rank == 12:
+        if size <= 4:
+            yield [size]
+        return
+    for count in range(min(size, 4) + 1):
+        for rest in rank_patterns(size - count, rank + 1):
+            yield [count] + rest
+
+
+def build_tables():
+    five_card_keys = set()
+    for counts in rank_patterns(5):
+        five_card_keys.add(hand_key(*classify(counts)))
+    flush_masks = [mask for mask in range(RANK_MASK + 1) if bin(mask).count("1") >= 5]
+    for mask in flush_masks:
+        if bin(mask).count("1") == 5:
+            five_card_keys.add(hand_key(*classify([0] * 13, [mask])))
+    strengths = {key: i + 1 for i, key in enumerate(sorted(five_card_keys))}
+
+    category = [0] * (len(strengths) + 1)
+    for (index, _), strength in strengths.items():
+        category[strength] = index
+
+    rank_table = {}
+    for size in (5, 6, 7):
+        for counts in rank_patterns(size):
+            key = sum(count * 5 ** rank for rank, count in enumerate(counts))
+            rank_table[key] = strengths[hand_key(*classify(counts))]
+
+    flush_table = [0] * (RANK_MASK + 1)
+    for mask in flush_masks:
+        flush_table[mask] = strengths[hand_key(*classify([0] * 13, [mask]))]
+    return rank_table, flush_table, category
+
+
+# Table cache
+#
+# Building the tables takes over a second, so they are saved the first time
+# and every later import maps them back in. Each table is a flat array file,
+# and manifest.json records TABLE_VERSION and every file's type, length and
+# SHA-256. A cache with another version, a missing file or a checksum that
+# doesn't match is rebuilt. Bump TABLE_VERSION whenever the tables change.
+# The rank table stays a dict, rebuilt from its saved keys and strengths,
+# since its keys are far too sparse for a flat array.
+TABLE_VERSION = 1
+TABLE_CACHE = os.environ.get("POKER_TABLE_CACHE",
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), "table_cache"))
+
+
+def save_tables(path, tables):
+    """Write {name: (typecode, values)} to the cache directory path, manifest last."""
+    os.makedirs(path, exist_ok=True)
+    manifest = {"version": TABLE_VERSION, "tables": {}}
+    for name, (typecode, values) in tables.items():
+        data = array(typecode, values).tobytes()
+        file = os.path.join(path, f"{name}.bin")
+        with open(file + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(file + ".tmp", file)
+        manifest["tables"][name] = {"typecode": typecode, "length": len(values),
+                                    "sha256": hashlib.sha256(data).hexdigest()}
+    with open(os.path.join(path, "manifest.json.tmp"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(os.path.join(path, "manifest.json.tmp"), os.path.join(path, "manifest.json"))
+
+
+def load_tables(path):
+    """
+    Memory-map every table in the cache directory path as a memoryview of its
+    typecode. Returns None if the cache is missing, stale or corrupt.
+    """
+    try:
+        with open(os.path.join(path, "manifest.json")) as f:
+            manifest = json.load(f)
+        if manifest.get("version") != TABLE_VERSION:
+            return None
+        tables = {}
+        for name, entry in manifest["tables"].items():
+            with open(os.path.join(path, f"{name}.bin"), "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if hashlib.sha256(data).hexdigest() != entry["sha256"]:
+                return None
+            view = memoryview(data).cast(entry["typecode"])
+            if len(view) != entry["length"]:
+                return None
+            tables[name] = view
+        return tables
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def cached_tables(path=TABLE_CACHE):
+    """build_tables(), from the cache at path when it is valid, rebuilding and saving it when not."""
+    tables = load_tables(path)
+    if tables is not None and {"rank_keys", "rank_strengths", "flush", "category"} <= tables.keys():
+        return (dict(zip(tables["rank_keys"], tables["rank_strengths"])),
+                tables["flush"], tables["category"])
+    rank_table, flush_table, category = build_tables()
+    keys = sorted(rank_table)
+    try:
+        save_tables(path, {"rank_keys": ("I", keys),
+                           "rank_strengths": ("H", [rank_table[key] for key in keys]),
+                           "flush": ("H", flush_table), "category": ("B", category)})
+    except OSError:
+        # A read-only install still works, it just builds the tables every time
+        pass
+    return rank_table, flush_table, category
+
+
+RANK_TABLE, FLUSH_TABLE, CATEGORY = cached_tables()
+
+
+def evaluate(cards):
+    """Strength of the best five-card hand among 5 to 7 card ids (ints or NumPy integers)."""
+    key = mask = suits = 0
+    for card in cards:
+        key += RANK_KEY[card]
+        suits += SUIT_NIBBLE[card]
+        # int() so NumPy ids, e.g. uint8 rows from pokerbatch, don't shift in their own dtype
+        mask |= 1 << int(card)
+    flush = (suits + 0x3333) & 0x8888
+    if flush:
+        return FLUSH_TABLE[mask >> FLUSH_SHIFT[flush] & RANK_MASK]
+    return RANK_TABLE[key]
+
+
+def evaluate7(a, b, c, d, e, f, g):
+    """evaluate() unrolled for exactly seven card ids."""
+    suits = (SUIT_NIBBLE[a] + SUIT_NIBBLE[b] + SUIT_NIBBLE[c] + SUIT_NIBBLE[d]
+             + SUIT_NIBBLE[e] + SUIT_NIBBLE[f] + SUIT_NIBBLE[g])
+    flush = (suits + 0x3333) & 0x8888
+    if flush:
+        mask = (1 << int(a) | 1 << int(b) | 1 << int(c) | 1 << int(d) | 1 << int(e)
+                | 1 << int(f) | 1 << int(g))
+        return FLUSH_TABLE[mask >> FLUSH_SHIFT[flush] & RANK_MASK]
+    return RANK_TABLE[RANK_KEY[a] + RANK_KEY[b] + RANK_KEY[c] + RANK_KEY[d]
+                      + RANK_KEY[e] + RANK_KEY[f] + RANK_KEY[g]]
+
+
+def hand_name(strength):
+    return HAND_NAMES[CATEGORY[strength]]
+
+
+# Memo in front of classify()
+#
+# quality() never reclassifies: the lookup tables above already hold every
+# rank pattern. best_five() still runs classify() to get the cards behind the
+# strength, which simulate_poker() shows for the winning hand, so its results
+# are memoized by rank pattern (the base-5 rank key) and the flush suit's rank
+# mask, which is all they depend on, in a bounded LRU cache.
+# classify_cache_info() reports its hits and misses.
+def classify_pattern(rank_key, flush_mask):
+    counts = [rank_key // 5 ** rank % 5 for rank in range(13)]
+    name, ranks = classify(counts, [flush_mask] if flush_mask else [])
+    return name, tuple(ranks)
+
+
+def set_classify_cache(maxsize=65536):
+    """Replace the classify cache with an empty one holding up to maxsize patterns (None for no bound)."""
+    global cached_classify
+    cached_classify = lru_cache(maxsize=maxsize)(classify_pattern)
+
+
+def classify_cache_info():
+    """Hits, misses, maxsize and current size of the classify cache."""
+    return cached_classify.cache_info()
+
+
+set_classify_cache()
+
+
 class Card:
+    # Cards also carry their bit, rank key and suit nibble so hands can add
+    # them without any table lookups
+    __slots__ = ("suit", "rank", "id", "bit", "key", "nibble")
+
     def __init__(self, suit, rank):
+        # Accept either the display symbols ('♠', 'A') or their indexes
+        if isinstance(suit, str):
+            suit = SUIT_INDEX[suit]
+        if isinstance(rank, str):
+            rank = RANK_INDEX[rank]
         self.suit = suit
         self.rank = rank
-        
+        self.id = card_id(suit, rank)
+        self.bit = 1 << self.id
+        self.key = RANK_KEY[self.id]
+        self.nibble = SUIT_NIBBLE[self.id]
+
+    @classmethod
+    def from_id(cls, card):
+        return cls(card // 13, card % 13)
+
     def __str__(self):
-        return f"{self.rank}{self.suit}"
-        
+        return card_str(self.id)
+
+    def __eq__(self, other):
+        return isinstance(other, Card) and self.id == other.id
+
+    def __hash__(self):
+        return self.id
+
     def __lt__(self, other):
         return self.rank < other.rank
-        
+
     def __gt__(self, other):
         return self.rank > other.rank
 
+# One shared instance per card id, cards are never mutated
+CARDS = [Card.from_id(card) for card in range(52)]
+
+# (strength, name) for every strength, so quality() hands back a shared tuple
+QUALITIES = [(strength, HAND_NAMES[category]) for strength, category in enumerate(CATEGORY)]
+NO_RANKS = (0,) * 13
+NO_SUITS = (0,) * 4
+
 class Hand:
+    __slots__ = ("cards", "mask", "rank_counts", "suit_counts", "rank_key", "suits", "hand", "score")
+
     def __init__(self):
-        self.rank_points = {
-            "A": 2**(-1), "K": 2**(-2), "Q": 2**(-3), "J": 2**(-4),
-            "T": 2**(-5), "9": 2**(-6), "8": 2**(-7), "7": 2**(-8),
-            "6": 2**(-9), "5": 2**(-10), "4": 2**(-11), "3": 2**(-12),
-            "2": 2**(-13)
-        }
-        self.numcards = {"2":0, "3":0, "4":0, "5":0, "6":0, "7":0, "8":0, 
-                        "9":0, "T":0, "J":0, "Q":0, "K":0, "A":0}
-        self.suitcards = {"♠":0, "♥":0, "♦":0, "♣":0}
         self.cards = []
+        self.mask = 0
+        self.rank_counts = [0] * 13
+        self.suit_counts = [0] * 4
+        # The lookup state: base-5 rank key and suit counts packed in nibbles,
+        # kept up to date one card at a time
+        self.rank_key = 0
+        self.suits = 0
+        self.hand = ""
+        self.score = 0
+
+    def reset(self):
+        """Empty the hand in place, keeping its lists for reuse."""
+        self.cards.clear()
+        self.mask = 0
+        self.rank_counts[:] = NO_RANKS
+        self.suit_counts[:] = NO_SUITS
+        self.rank_key = 0
+        self.suits = 0
         self.hand = ""
         self.score = 0
 
     def add_card(self, card):
         self.cards.append(card)
-        self.numcards[card.rank] += 1
-        self.suitcards[card.suit] += 1
+        self.mask |= card.bit
+        self.rank_counts[card.rank] += 1
+        self.suit_counts[card.suit] += 1
+        self.rank_key += card.key
+        self.suits += card.nibble
+
+    def remove_card(self, card):
+        self.cards.remove(card)
+        self.mask &= ~card.bit
+        self.rank_counts[card.rank] -= 1
+        self.suit_counts[card.suit] -= 1
+        self.rank_key -= card.key
+        self.suits -= card.nibble
 
     def add_cards(self, cards):
         for card in cards:
@@ -55,144 +433,95 @@ class Hand:
         return False
 
     def sort(self):
-        self.cards.sort(key=lambda card: 1-self.rank_points[card.rank])
+        self.cards.sort(key=lambda card: -card.rank)
+
+    def suit_mask(self, suit):
+        return (self.mask >> (13 * suit)) & RANK_MASK
+
+    def rank_mask(self):
+        mask = self.mask
+        return (mask | mask >> 13 | mask >> 26 | mask >> 39) & RANK_MASK
+
+    def best_five(self):
+        """
+        Classify the hand from its rank counts and suit masks.
+
+        Returns the hand name and the ranks of the best five cards, ordered
+        so that the cards that make the hand come before the kickers.
+        """
+        flush_mask = 0
+        for suit in range(4):
+            if self.suit_counts[suit] >= 5:
+                flush_mask = self.suit_mask(suit)
+        name, ranks = cached_classify(self.rank_key, flush_mask)
+        return name, list(ranks)
+
+    def strength(self):
+        """Integer strength of the hand from the lookup tables (5 to 7 cards)."""
+        if not 5 <= len(self.cards) <= 7:
+            raise ValueError("Can only evaluate hands of 5 to 7 cards")
+        flush = (self.suits + 0x3333) & 0x8888
+        if flush:
+            return FLUSH_TABLE[self.mask >> FLUSH_SHIFT[flush] & RANK_MASK]
+        return RANK_TABLE[self.rank_key]
+
+    def strength_with(self, card):
+        """Strength of the hand plus one more card id (4 to 6 cards), leaving the hand as it is."""
+        flush = (self.suits + SUIT_NIBBLE[card] + 0x3333) & 0x8888
+        if flush:
+            return FLUSH_TABLE[(self.mask | 1 << card) >> FLUSH_SHIFT[flush] & RANK_MASK]
+        return RANK_TABLE[self.rank_key + RANK_KEY[card]]
+
+    def strength_on(self, board):
+        """
+        Strength of the hand together with another hand's cards, usually the
+        board, leaving both as they are. The board's counts are only summed
+        once however many hands are scored on it.
+        """
+        if not 5 <= len(self.cards) + len(board.cards) <= 7:
+            raise ValueError("Can only evaluate hands of 5 to 7 cards")
+        flush = (self.suits + board.suits + 0x3333) & 0x8888
+        if flush:
+            return FLUSH_TABLE[(self.mask | board.mask) >> FLUSH_SHIFT[flush] & RANK_MASK]
+        return RANK_TABLE[self.rank_key + board.rank_key]
 
     def quality(self):
-        backup = Hand()
-        backup = backup + self
-        backup.sort()
-
-        hand_points = {
-            "Straight Flush": 18, "Four of a Kind": 15, "Full House": 12,
-            "Flush": 10, "Straight": 8, "Three of a Kind": 5,
-            "Two Pair": 3, "Pair": 1, "High Card": 0
-        }
-
-        cards = []
-        mult_score = 0
-        size = {"0": 0, "2": 2, "3": 3, "4": 4, "5": 5, "6": 6, "7": 7,
-                "8": 8, "9": 9, "T": 10, "J": 11, "Q": 12, "K": 13, "A": 14}
-
-        # Four of a Kind
-        if 4 in backup.numcards.values():
-            mult_score = hand_points["Four of a Kind"]
-            quads = [card for card in backup.cards if backup.numcards[card.rank] == 4]
-            remaining = [card for card in backup.cards if card not in quads]
-            remaining.sort(key=lambda card: self.rank_points[card.rank], reverse=True)
-            backup.cards = quads + remaining[:1]
-            self.hand = "Four of a Kind"
-            return mult_score + sum(self.rank_points[card.rank] for card in backup.cards), self.hand
-
-        # Full House and Three of a Kind
-        elif 3 in backup.numcards.values():
-            trips_rank = next(rank for rank, count in backup.numcards.items() if count == 3)
-            trips = [card for card in backup.cards if card.rank == trips_rank]
-            remaining = [card for card in backup.cards if card not in trips]
-            
-            # Check for Full House
-            if 2 in [backup.numcards[card.rank] for card in remaining]:
-                pair_rank = next(card.rank for card in remaining 
-                               if backup.numcards[card.rank] == 2)
-                pair = [card for card in remaining if card.rank == pair_rank][:2]
-                backup.cards = trips + pair
-                mult_score = hand_points["Full House"]
-            else:
-                remaining.sort(key=lambda card: self.rank_points[card.rank], reverse=True)
-                backup.cards = trips + remaining[:2]
-                mult_score = hand_points["Three of a Kind"]
-
-        # Pairs
-        elif 2 in backup.numcards.values():
-            pairs = []
-            remaining = list(backup.cards)
-            
-            # Find all pairs
-            for rank in backup.numcards:
-                if backup.numcards[rank] == 2:
-                    pair = [card for card in remaining if card.rank == rank]
-                    pairs.extend(pair)
-                    remaining = [card for card in remaining if card not in pair]
-            
-            remaining.sort(key=lambda card: self.rank_points[card.rank], reverse=True)
-            
-            if len(pairs) >= 4:  # Two pair
-                backup.cards = pairs[:4] + remaining[:1]
-                mult_score = hand_points["Two Pair"]
-            else:  # One pair
-                backup.cards = pairs[:2] + remaining[:3]
-                mult_score = hand_points["Pair"]
-
-        # Check for straight and flush
-        flush = any(count >= 5 for count in backup.suitcards.values())
-        flush_suit = next((suit for suit, count in backup.suitcards.items() 
-                         if count >= 5), None)
-        
-        ranks = "23456789TJQKA"
-        rank_sequence = "".join(sorted(set(card.rank for card in backup.cards), 
-                                     key=lambda x: ranks.index(x)))
-        
-        straight = any(ranks[i:i+5] in rank_sequence for i in range(len(ranks) - 4))
-        if not straight and "2345A" in rank_sequence:
-            straight = True
-            
-        if flush and straight:
-            flush_cards = [card for card in backup.cards if card.suit == flush_suit]
-            flush_ranks = "".join(sorted(set(card.rank for card in flush_cards), 
-                                       key=lambda x: ranks.index(x)))
-            
-            straight_flush = any(ranks[i:i+5] in flush_ranks 
-                               for i in range(len(ranks) - 4))
-            if not straight_flush and "2345A" in flush_ranks:
-                straight_flush = True
-                
-            if straight_flush:
-                backup.cards = [card for card in flush_cards 
-                              if card.rank in ranks][:5]
-                mult_score = hand_points["Straight Flush"]
-        elif flush:
-            flush_cards = [card for card in backup.cards if card.suit == flush_suit]
-            flush_cards.sort(key=lambda card: self.rank_points[card.rank], reverse=True)
-            backup.cards = flush_cards[:5]
-            mult_score = hand_points["Flush"]
-        elif straight:
-            straight_cards = []
-            for i in range(len(ranks) - 4):
-                if ranks[i:i+5] in rank_sequence:
-                    pattern = ranks[i:i+5]
-                    straight_cards = [card for card in backup.cards 
-                                    if card.rank in pattern][:5]
-                    break
-            if not straight_cards and "2345A" in rank_sequence:
-                pattern = "2345A"
-                straight_cards = [card for card in backup.cards 
-                                if card.rank in pattern][:5]
-            backup.cards = straight_cards
-            mult_score = hand_points["Straight"]
-
-        # Calculate final score
-        score = mult_score
-        for card in backup.cards[:5]:
-            score += self.rank_points[card.rank]
-            
-        self.score = score
-        for hand, hand_score in hand_points.items():
-            if hand_score <= self.score:
-                self.hand = hand
-                break
-                
-        return self.score, self.hand
+        quality = QUALITIES[self.strength()]
+        self.score, self.hand = quality
+        return quality
+
+def deal_streams(seed, count):
+    """
+    Independent random.Random streams for `count` workers, all derived from
+    one master seed, so a split-up run deals the same cards every time.
+    """
+    # str seeds are hashed with SHA-512, so neighbouring streams don't overlap
+    return [random.Random(f"{seed}/{stream}") for stream in range(count)]
 
 class Deck:
-    def __init__(self, fresh=True):
+    __slots__ = ("rng", "cards")
+
+    def __init__(self, fresh=True, rng=None):
+        # rng is a random.Random, or the random module's shared generator
+        self.rng = rng if rng is not None else random
         if fresh:
-            suits = ['♠', '♥', '♦', '♣']
-            ranks = ['2', '3', '4', '5', '6', '7', '8', '9', 'T', 'J', 'Q', 'K', 'A']
-            self.cards = [Card(suit, rank) for suit in suits for rank in ranks]
+            self.cards = list(CARDS)
         else:
             self.cards = []
 
-    def shuffle(self):
-        random.shuffle(self.cards)
+    def shuffle(self, cards=None):
+        """
+        Shuffle the deck. If cards is given, only that many cards are drawn
+        (a partial Fisher-Yates from the end of the deck, where deal() takes
+        cards from), which is all a hand needs.
+        """
+        if cards is None:
+            self.rng.shuffle(self.cards)
+            return
+        deck = self.cards
+        for i in range(len(deck) - 1, max(len(deck) - 1 - cards, 0), -1):
+            j = self.rng.randrange(i + 1)
+            deck[i], deck[j] = deck[j], deck[i]
 
     def deal(self):
         return self.cards.pop() if self.cards else None
@@ -206,11 +535,23 @@ class Deck:
             raise TypeError("Can only add Card or other Deck objects")
 
 class Player:
+    __slots__ = ("name", "hand", "score", "type", "share", "streets")
+
     def __init__(self, name):
         self.name = name
         self.hand = Hand()
         self.score = 0
         self.type = ""
+        self.share = 0
+        self.streets = []
+
+    def reset(self):
+        """Clear the player for a new deal, reusing their hand."""
+        self.hand.reset()
+        self.score = 0
+        self.type = ""
+        self.share = 0
+        self.streets.clear()
 
     def add_card(self, card):
         self.hand.add_card(card)
@@ -225,13 +566,30 @@ class Player:
     def sort(self):
         self.hand.sort()
 
-    def quality(self):
-        self.score, self.type = self.hand.quality()
+    def quality(self, board=None):
+        """Score the player's hand, together with the board's cards if given."""
+        if board is None:
+            self.score, self.type = self.hand.quality()
+        else:
+            self.score, self.type = QUALITIES[self.hand.strength_on(board.hand)]
+
+    def full_hand(self, board):
+        """A new, sorted Hand of the player's cards and the board's."""
+        hand = Hand()
+        hand.add_cards(self.hand.cards)
+        hand.add_cards(board.hand.cards)
+        hand.sort()
+        return hand
 
 class CommunityCards:
+    __slots__ = ("hand",)
+
     def __init__(self):
         self.hand = Hand()
 
+    def reset(self):
+        self.hand.reset()
+
     def add_card(self, card):
         self.hand.add_card(card)
 
@@ -241,9 +599,73 @@ class CommunityCards:
     def sort(self):
         self.hand.sort()
 
-def simulate_poker(num_players, debug=False, printer=False):
-    deck = Deck()
-    deck.shuffle()
+def showdown(players):
+    """
+    The players holding the best hand, in seat order. Scores are integer
+    strengths, so equal hands tie exactly and split the pot; each player's
+    share of the pot is set as well.
+    """
+    best = max(player.score for player in players)
+    winners = [player for player in players if player.score == best]
+    for player in players:
+        player.share = 1 / len(winners) if player.score == best else 0
+    return winners
+
+def street_equity(players, board, dead=()):
+    """
+    Exact equity of each player from the flop or the turn. Player hands hold
+    only their hole cards, as simulate_poker() leaves them, and board is the
+    community Hand or CommunityCards.
+
+    The board is copied, every remaining turn and river card is added to the
+    copy and taken off again, and each player is scored on it with
+    strength_on(), so each board costs one incremental update and one lookup
+    per player.
+    """
+    board = board.hand if isinstance(board, CommunityCards) else board
+    known = board.mask
+    for player in players:
+        known |= player.hand.mask
+    for card in dead:
+        known |= 1 << card
+    remaining = [card for card in range(52) if not known >> card & 1]
+    hands = [player.hand for player in players]
+    shares = [0.0] * len(players)
+    boards = 0
+    runout = Hand()
+    runout.add_cards(board.cards)
+
+    def settle(strengths):
+        best = max(strengths)
+        split = strengths.count(best)
+        for i, strength in enumerate(strengths):
+            if strength == best:
+                shares[i] += 1 / split
+
+    def sweep_rivers(rivers):
+        nonlocal boards
+        for river in rivers:
+            runout.add_card(CARDS[river])
+            settle([hand.strength_on(runout) for hand in hands])
+            runout.remove_card(CARDS[river])
+            boards += 1
+
+    if len(board.cards) == 4:
+        sweep_rivers(remaining)
+    elif len(board.cards) == 3:
+        for i, turn in enumerate(remaining):
+            runout.add_card(CARDS[turn])
+            sweep_rivers(remaining[i + 1:])
+            runout.remove_card(CARDS[turn])
+    else:
+        raise ValueError("Equity can only be swept from the flop or the turn")
+    return [share / boards for share in shares]
+
+def simulate_poker(num_players, debug=False, printer=False, rng=None, streets=False):
+    # With streets=True each player's best hand after the flop, turn and river
+    # is recorded in player.streets; otherwise hands are only scored at the river
+    deck = Deck(rng=rng)
+    deck.shuffle(2 * num_players + 5)
     players = [Player(f"Player {i+1}") for i in range(num_players)]
     community = CommunityCards()
 
@@ -252,79 +674,156 @@ def simulate_poker(num_players, debug=False, printer=False):
         for player in players:
             card = deck.deal()
             player.add_card(card)
+    if debug:
+        for player in players:
+            player.sort()
+            print(f"{player.name}'s hand: {player.show_hand()}")
 
-    # Deal community cards
-    for _ in range(5):
-        card = deck.deal()
-        community.add_card(card)
+    # Deal community cards street by street. The board's rank key, suit
+    # counts and mask are kept once in the community hand, and every player
+    # is scored by adding their two hole cards to them, a single lookup per
+    # player per street scored. Player hands keep only their hole cards
+    for street, cards in (("Flop", 3), ("Turn", 1), ("River", 1)):
+        for _ in range(cards):
+            community.add_card(deck.deal())
+        if streets:
+            for player in players:
+                player.quality(community)
+                player.streets.append((street, player.score, player.type))
+    if not streets:
+        for player in players:
+            player.quality(community)
 
-    # Evaluate hands
     for player in players:
         player.sort()
         if debug:
-            print(f"{player.name}'s hand: {player.show_hand()}")
-        player.hand = player.hand + community.hand
-        player.sort()
-        player.quality()
-        if debug:
-            print(f"Full hand = {player.show_hand()}, "
+            print(f"Full hand = {player.full_hand(community).show_hand()}, "
                   f"Quality: {player.score}, Type: {player.type}")
 
-    best_player = max(players, key=lambda p: p.hand.score)
+    # best_player is the first winner; a split pot shows up in player.share
+    winners = showdown(players)
+    best_player = winners[0]
     if debug or printer:
-        print(f"Winner: {best_player.name} with {best_player.show_hand()}, "
-              f"Score: {best_player.hand.score}, Hand: {best_player.type}")
+        full_hand = best_player.full_hand(community)
+        best_five = " ".join(RANKS[rank] for rank in full_hand.best_five()[1])
+        if len(winners) > 1:
+            print(f"Split pot between {', '.join(player.name for player in winners)}, "
+                  f"Score: {best_player.score}, Hand: {best_player.type}, Best five: {best_five}")
+        else:
+            print(f"Winner: {best_player.name} with {full_hand.show_hand()}, "
+                  f"Score: {best_player.score}, Hand: {best_player.type}, Best five: {best_five}")
 
     community.sort()
     if debug:
         print(f"Community cards: {community.show_hand()}")
 
+    # Player hands hold only their hole cards; player.full_hand(community)
+    # gives all seven
     return players, community, best_player, deck
 
-from itertools import combinations
-
-def test_all_7_card_hands():
-    suits = ['♠', '♥', '♦', '♣']
-    ranks = ['2', '3', '4', '5', '6', '7', '8', '9', 'T', 'J', 'Q', 'K', 'A']
-    deck = [Card(suit, rank) for suit in suits for rank in ranks]
-    all_hands = combinations(deck, 7)
-    with open('test.json', 'a') as f:
-        # Test each combination
-        for hand_cards in all_hands:
+def test_all_7_card_hands(processes=None, hands_dir=None):
+    # Splits the hands across a process pool and checkpoints as it goes, see
+    # pokerenum.py. Pass hands_dir to also write out every hand as JSON lines.
+    from pokerenum import enumerate_all_hands, report
+    results = enumerate_all_hands(processes=processes, hands_dir=hands_dir)
+    report(results)
+    return results
+
+# Sampling hands of one category
+#
+# A 7-card hand holding five or more cards of one suit is a flush or straight
+# flush depending only on that suit's rank mask M, and is completed by any
+# 7 - |M| cards of the other 39. Every other hand is a rank multiset plus a
+# choice of suits per rank that leaves no suit with five cards, and its
+# category is that of the multiset. So a category is sampled uniformly by
+# picking a mask or multiset weighted by how many hands it stands for, then
+# the suits uniformly among the ones that keep it in the category.
+category_weights = None
+
+
+def flush_assignments(counts):
+    """How many suit choices for a rank multiset put five or more cards in one suit."""
+    present = [rank for rank in range(13) if counts[rank]]
+    total = 0
+    for size in range(5, len(present) + 1):
+        for in_suit in combinations(present, size):
+            ways = 1
+            for rank in present:
+                ways *= comb(3, counts[rank] - (rank in in_suit))
+            total += ways
+    # Only one suit can hold five of seven cards
+    return 4 * total
+
+
+def build_category_weights():
+    """Per category, the masks or rank multisets its hands are built from and their weights."""
+    weights = {name: ([], []) for name in HAND_NAMES}
+    for mask in range(RANK_MASK + 1):
+        size = bin(mask).count("1")
+        if 5 <= size <= 7:
+            items, counts = weights[HAND_NAMES[CATEGORY[FLUSH_TABLE[mask]]]]
+            items.append(("flush", mask))
+            counts.append(4 * comb(39, 7 - size))
+    for counts_by_rank in rank_patterns(7):
+        ways = 1
+        for count in counts_by_rank:
+            ways *= comb(4, count)
+        ways -= flush_assignments(counts_by_rank)
+        if ways:
+            key = sum(count * 5 ** rank for rank, count in enumerate(counts_by_rank))
+            items, counts = weights[HAND_NAMES[CATEGORY[RANK_TABLE[key]]]]
+            items.append(("ranks", tuple(counts_by_rank)))
+            counts.append(ways)
+    # random.choices wants cumulative weights
+    return {name: (items, list(accumulate(counts))) for name, (items, counts) in weights.items()}
+
+
+def sample_category(name, rng=None):
+    """
+    A uniformly random 7-card hand of the named category, as card ids.
+
+    Every hand of the category is equally likely, without rejection sampling
+    over whole deals. rng is a random.Random, or the random module's
+    generator if not given.
+    """
+    global category_weights
+    if category_weights is None:
+        category_weights = build_category_weights()
+    rng = rng if rng is not None else random
+    items, cum_weights = category_weights[name]
+    kind, value = rng.choices(items, cum_weights=cum_weights)[0]
+    if kind == "flush":
+        suit = rng.randrange(4)
+        cards = [card_id(suit, rank) for rank in range(13) if value >> rank & 1]
+        others = [card for card in range(52) if card // 13 != suit]
+        return cards + rng.sample(others, 7 - len(cards))
+    while True:
+        # Any suits without a five-card suit are equally likely; this rarely retries
+        cards = [card_id(suit, rank) for rank in range(13)
+                 for suit in rng.sample(range(4), value[rank])]
+        suits = [card // 13 for card in cards]
+        if max(suits.count(suit) for suit in range(4)) < 5:
+            return cards
+
+
+def testrandom7cardhands(per_type=10, rng=None):
+    for hand_type in reversed(HAND_NAMES):
+        for _ in range(per_type):
             test_hand = Hand()
-            test_hand.add_cards(hand_cards)
+            test_hand.add_cards(CARDS[card] for card in sample_category(hand_type, rng))
             test_hand.sort()
-            quality, hand_type = test_hand.quality()
-            print(f"Hand: {test_hand.show_hand()}, Quality: {quality}, Type: {hand_type}")
-            json.dump({"Hand": test_hand.show_hand(), "Quality": quality, "Type": hand_type}, f)
-            f.write('\n')
-
-def testrandom7cardhands():
-    suits = ['♠', '♥', '♦', '♣']
-    ranks = ['2', '3', '4', '5', '6', '7', '8', '9', 'T', 'J', 'Q', 'K', 'A']
-    handtypes = {"Straight Flush" : 0, "Four of a Kind" : 0, "Full House" : 0, "Flush" : 0, "Straight" : 0, "Three of a Kind" : 0, "Two Pair" : 0, "Pair" : 0, "High Card" : 0}
-    for type in handtypes.keys():
-        handtypes[type] = 10
-    while len(handtypes) > 0:
-        deck = [Card(suit, rank) for suit in suits for rank in ranks]
-        random.shuffle(deck)
-        test_hand = Hand()
-        test_hand.add_cards(deck[:7])
-        test_hand.sort()
-        quality, hand_type = test_hand.quality()
-        if hand_type in handtypes.keys():
-            print(f"Hand: {test_hand.show_hand()}, Quality: {quality}, Type: {hand_type}")
-            handtypes[hand_type] -= 1
-            if handtypes[hand_type] == 0:
-                del handtypes[hand_type]
-
-        
-# Note: Running this function would take significant time and resources due to the large number of combinations
+            quality, found_type = test_hand.quality()
+            print(f"Hand: {test_hand.show_hand()}, Quality: {quality}, Type: {found_type}")
+            if found_type != hand_type:
+                raise AssertionError(f"Sampled a {found_type} as a {hand_type}")
+
+# Note: test_all_7_card_hands evaluates all 133,784,560 hands, give it a many-core machine
 #test_all_7_card_hands()
 #testrandom7cardhands()
-#test a 7 card hand to see if it identfies correctly
-test_hand = Hand()
-test_hand.add_cards([Card('♥', '3'), Card('♠', '3'), Card('♠', '4'), Card('♠', '5'), Card('♠', '6'), Card('♠', '7'), Card('♠', '8')])
-test_hand.sort()
-quality, hand_type = test_hand.quality()
-print(f"Hand: {test_hand.show_hand()}, Quality: {quality}, Type: {hand_type}")
+if __name__ == "__main__":
+    #test a 7 card hand to see if it identfies correctly
+    test_hand = Hand()
+    test_hand.add_cards([Card('♥', '3'), Card('♠', '3'), Card('♠', '4'), Card('♠', '5'), Card('♠', '6'), Card('♠', '7'), Card('♠', '8')])
+    test_hand.sort()
+    quality, hand_type = test_hand.quality()
+    print(f"Hand: {test_hand.show_hand()}, Quality: {quality}, Type: {hand_type}")
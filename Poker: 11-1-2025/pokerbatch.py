@@ -0,0 +1,219 @@
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+from poker import RANK_TABLE, FLUSH_TABLE, CATEGORY, HAND_NAMES, RANK_KEY, SUIT_NIBBLE, RANK_MASK
+
+# Batch versions of the lookup-table evaluator in poker.py: hands are rows of an
+# integer array of card ids and every step runs over the whole batch at once.
+#
+# Each card id maps to its 5**rank rank key, its suit-count nibble and its bit
+# in the 52-bit card mask; since a hand's cards are distinct, summing those per
+# row gives the rank key, the packed suit counts and the card mask. The rank
+# table is keyed sparsely, so it is stored as sorted keys for searchsorted. The
+# flush table is already a dense array over the 13-bit rank masks.
+
+CARD_RANK_KEYS = np.array(RANK_KEY, dtype=np.int64)
+CARD_NIBBLES = np.array(SUIT_NIBBLE, dtype=np.int64)
+CARD_BITS = np.left_shift(1, np.arange(52, dtype=np.int64))
+RANK_KEYS = np.array(sorted(RANK_TABLE), dtype=np.int64)
+RANK_STRENGTHS = np.array([RANK_TABLE[key] for key in RANK_KEYS], dtype=np.uint16)
+FLUSH_STRENGTHS = np.array(FLUSH_TABLE, dtype=np.uint16)
+CATEGORIES = np.array(CATEGORY, dtype=np.uint8)
+
+
+def evaluate_batch(hands):
+    """
+    Evaluate many hands at once.
+
+    Parameters
+    ----------
+    hands : array_like of int, shape (N, 5), (N, 6) or (N, 7)
+        Card ids (suit * 13 + rank), one hand per row, no repeats within a row.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        The hand category of each row as uint8 (an index into HAND_NAMES) and
+        its strength as uint16, with the same meaning as poker.evaluate().
+    """
+    hands = np.asarray(hands)
+    if hands.ndim != 2 or not 5 <= hands.shape[1] <= 7:
+        raise ValueError("hands must have shape (N, 5), (N, 6) or (N, 7)")
+
+    # Rank counts, and with them pairs, trips, quads and straights, all live in
+    # the base-5 rank key
+    keys = CARD_RANK_KEYS[hands].sum(axis=1)
+    nibbles = CARD_NIBBLES[hands].sum(axis=1)
+    strengths = table_strengths(keys, nibbles, lambda rows: CARD_BITS[hands[rows]].sum(axis=1))
+    return CATEGORIES[strengths], strengths
+
+
+def table_strengths(keys, nibbles, masks):
+    """
+    Strengths from the rank keys and packed suit counts of any array of hands.
+    masks(rows) gives the 52-bit card masks of the hands at those indexes and
+    is only asked for the flush hands.
+    """
+    strengths = RANK_STRENGTHS[np.searchsorted(RANK_KEYS, keys)]
+
+    # Four suit counts packed in nibbles; adding 3 to each sets bit 3 of any
+    # count that reached five, and only one suit can in 7 cards
+    flush = (nibbles + 0x3333) & 0x8888
+    rows = np.nonzero(flush)
+    if rows[0].size:
+        suits = (np.log2(flush[rows]).astype(np.int64) - 3) // 4
+        strengths[rows] = FLUSH_STRENGTHS[masks(rows) >> (13 * suits) & RANK_MASK]
+    return strengths
+
+
+def showdown(strengths):
+    """
+    Resolve many showdowns at once from a (deals, seats) array of strengths.
+
+    Returns a (deals, seats) mask of the seats holding the best hand, the
+    number of seats splitting each pot and each seat's share of the pot.
+    """
+    winners = strengths == strengths.max(axis=1, keepdims=True)
+    split = winners.sum(axis=1)
+    return winners, split, winners / split[:, None]
+
+
+def finishing_order(strengths):
+    """Seats of each deal from best hand to worst, ties kept in seat order."""
+    return np.argsort(-strengths.astype(np.int32), axis=1, kind="stable")
+
+
+def deal_dtype(num_players):
+    return np.dtype([
+        ("hole", np.uint8, (num_players, 2)), ("board", np.uint8, (5,)),
+        ("strengths", np.uint16, (num_players,)), ("categories", np.uint8, (num_players,)),
+        ("winner", np.uint8), ("split", np.uint8), ("strength", np.uint16), ("category", np.uint8)
+    ])
+
+
+def simulate_batch(num_players, num_deals, rng=None, chunk_size=100_000):
+    """
+    Deal and resolve many hands of simulate_poker at once.
+
+    Each deal draws 2 * num_players + 5 cards; like simulate_poker, the first
+    two rounds go to the players and the next five to the board.
+    The board's rank key, suit counts and card mask are summed once per deal
+    and every seat only adds its two hole cards to them.
+
+    Parameters
+    ----------
+    num_players : int
+        Players per deal, 2 to 23.
+    num_deals : int
+        How many deals to simulate.
+    rng : np.random.Generator or seed, optional
+        Random source, passed through np.random.default_rng().
+    chunk_size : int
+        Deals generated and scored per step, bounding memory use.
+
+    Returns
+    -------
+    np.ndarray
+        One record per deal (see deal_dtype) with the hole cards and board,
+        every seat's strength and category, and the winning seat (the first
+        one with the best hand), how many seats share the pot and the
+        winning strength and category.
+    """
+    if not 2 <= num_players <= 23:
+        raise ValueError("A deal seats 2 to 23 players")
+    rng = np.random.default_rng(rng)
+    deals = np.empty(num_deals, dtype=deal_dtype(num_players))
+    used = 2 * num_players + 5
+    for start in range(0, num_deals, chunk_size):
+        count = min(chunk_size, num_deals - start)
+        cards = deal_cards(rng, count, used)
+        # Hole cards go round the table twice, then the board
+        hole = np.stack([cards[:, :num_players], cards[:, num_players:2 * num_players]], axis=2)
+        board = cards[:, 2 * num_players:]
+
+        board_keys = CARD_RANK_KEYS[board].sum(axis=1)
+        board_nibbles = CARD_NIBBLES[board].sum(axis=1)
+        board_masks = CARD_BITS[board].sum(axis=1)
+        keys = board_keys[:, None] + CARD_RANK_KEYS[hole].sum(axis=2)
+        nibbles = board_nibbles[:, None] + CARD_NIBBLES[hole].sum(axis=2)
+        strengths = table_strengths(
+            keys, nibbles, lambda rows: board_masks[rows[0]] + CARD_BITS[hole[rows]].sum(axis=1))
+
+        winners, split, _ = showdown(strengths)
+        best = strengths.max(axis=1)
+        chunk = deals[start:start + count]
+        chunk["hole"] = hole
+        chunk["board"] = board
+        chunk["strengths"] = strengths
+        chunk["categories"] = CATEGORIES[strengths]
+        chunk["winner"] = winners.argmax(axis=1)
+        chunk["split"] = split
+        chunk["strength"] = best
+        chunk["category"] = CATEGORIES[best]
+    return deals
+
+
+def deal_cards(rng, count, cards, deck=None):
+    """
+    Deal `cards` distinct cards from the deck for each of `count` rows.
+
+    A partial Fisher-Yates shuffle run on every row at once, so only the
+    cards that are dealt get drawn.
+    """
+    deck = np.arange(52) if deck is None else np.asarray(deck)
+    rows = np.tile(deck.astype(np.uint8), (count, 1))
+    index = np.arange(count)
+    for i in range(cards):
+        j = rng.integers(i, len(deck), size=count)
+        picked = rows[index, j]
+        rows[index, j] = rows[:, i]
+        rows[:, i] = picked
+    return rows[:, :cards]
+
+
+def random_hands(n, cards=7, rng=None):
+    """n random hands of distinct cards as an (n, cards) array of card ids."""
+    return deal_cards(np.random.default_rng(rng), n, cards)
+
+
+def simulate_block(args):
+    num_players, num_deals, seed = args
+    return simulate_batch(num_players, num_deals, np.random.default_rng(seed))
+
+
+def parallel_simulate_batch(num_players, num_deals, seed=None, processes=None, block_size=100_000):
+    """
+    simulate_batch() split into blocks across a process pool.
+
+    Block i always gets the i-th stream spawned from the master seed and the
+    blocks are joined in order, so a given seed deals exactly the same hands
+    whatever the number of processes.
+    """
+    blocks = [min(block_size, num_deals - start) for start in range(0, num_deals, block_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(blocks))
+    jobs = [(num_players, count, child) for count, child in zip(blocks, seeds)]
+    if processes == 1:
+        return np.concatenate([simulate_block(job) for job in jobs])
+    with Pool(processes) as pool:
+        return np.concatenate(pool.map(simulate_block, jobs))
+
+
+if __name__ == "__main__":
+    hands = random_hands(1_000_000)
+    start = time.perf_counter()
+    categories, strengths = evaluate_batch(hands)
+    elapsed = time.perf_counter() - start
+    print(f"Evaluated {len(hands)} hands in {elapsed:.3f}s ({len(hands) / elapsed:,.0f} hands/s)")
+    counts = np.bincount(categories, minlength=len(HAND_NAMES))
+    for name, count in zip(reversed(HAND_NAMES), reversed(counts)):
+        print(f"{name}: {count / len(hands) * 100:.4f}%")
+
+    start = time.perf_counter()
+    deals = simulate_batch(9, 1_000_000)
+    elapsed = time.perf_counter() - start
+    print(f"Simulated {len(deals)} 9-handed deals in {elapsed:.3f}s ({len(deals) / elapsed:,.0f} deals/s)")
+    counts = np.bincount(deals["category"], minlength=len(HAND_NAMES))
+    for name, count in zip(reversed(HAND_NAMES), reversed(counts)):
+        print(f"Winning with {name}: {count / len(deals) * 100:.4f}%")
@@ -0,0 +1,249 @@
+import json
+import os
+import platform
+import random
+import time
+from itertools import combinations
+
+import numpy as np
+
+import poker
+import pokertest
+from pokerbatch import evaluate_batch
+from pokerenum import count_chunk, plan_chunks
+from pokerequity import combination_array
+
+# Speed and agreement of every hand evaluator we have.
+#
+# Each evaluator is wrapped to take a list of 7-card hands (card ids) and
+# return a score and a hand name per hand, higher scores winning. They are
+# timed on the same hands at several sizes, and checked against the
+# reference: a brute-force best of the 21 five-card hands in each seven,
+# written here without classify() or the lookup tables, since those are built
+# from classify() and would agree with it even where it is wrong. The
+# reference's (category, ranks) keys order hands exactly. An evaluator agrees
+# if it names every hand the same and its scores sort the hands the same way,
+# ties included. The category counts of all 2,598,960 five-card hands are
+# also checked against their known values. Results are written to JSON, and
+# compared against an earlier run if there is one to flag slowdowns.
+
+# Known 5-card category frequencies
+KNOWN_FIVE_CARD_FREQUENCIES = {
+    "Straight Flush": 40, "Four of a Kind": 624, "Full House": 3744, "Flush": 5108,
+    "Straight": 10200, "Three of a Kind": 54912, "Two Pair": 123552, "Pair": 1098240,
+    "High Card": 1302540
+}
+
+
+def five_card_key(cards):
+    """(category, ranks) of exactly five cards, ranks ordered by group size then rank."""
+    ranks = sorted((card % 13 for card in cards), reverse=True)
+    groups = sorted(((ranks.count(rank), rank) for rank in set(ranks)), reverse=True)
+    ordered = tuple(rank for count, rank in groups for _ in range(count))
+    flush = len({card // 13 for card in cards}) == 1
+    straight = None
+    if len(groups) == 5:
+        if ranks[0] - ranks[4] == 4:
+            straight = ranks[0]
+        elif ranks == [12, 3, 2, 1, 0]:
+            straight = 3
+    if straight is not None:
+        return (8 if flush else 4), (straight,)
+    if flush:
+        return 5, ordered
+    shape = tuple(count for count, _ in groups)
+    return {(4, 1): 7, (3, 2): 6, (3, 1, 1): 3, (2, 2, 1): 2, (2, 1, 1, 1): 1}.get(shape, 0), ordered
+
+
+def reference_keys(hands):
+    return [max(five_card_key(five) for five in combinations(cards, 5)) for cards in hands]
+
+
+def classify_hands(hands):
+    keys = []
+    for cards in hands:
+        hand = poker.Hand()
+        hand.add_cards(poker.CARDS[card] for card in cards)
+        keys.append(poker.hand_key(*poker.classify(
+            hand.rank_counts, [hand.suit_mask(suit) for suit in range(4) if hand.suit_counts[suit] >= 5])))
+    # The keys order hands, so each key's place among them is a score
+    order = {key: i for i, key in enumerate(sorted(set(keys)))}
+    return [order[key] for key in keys], [poker.HAND_NAMES[key[0]] for key in keys]
+
+
+def five_card_counts():
+    """Hands per category over every 5-card hand, by evaluate_batch()."""
+    categories, _ = evaluate_batch(combination_array(52, 5))
+    counts = np.bincount(categories, minlength=len(poker.HAND_NAMES))
+    return {name: int(counts[i]) for i, name in enumerate(poker.HAND_NAMES)}
+
+
+def evaluate7_hands(hands):
+    scores = [poker.evaluate7(*cards) for cards in hands]
+    return scores, [poker.hand_name(score) for score in scores]
+
+
+def hand_quality_hands(hands):
+    scores, names = [], []
+    for cards in hands:
+        hand = poker.Hand()
+        hand.add_cards(poker.CARDS[card] for card in cards)
+        score, name = hand.quality()
+        scores.append(score)
+        names.append(name)
+    return scores, names
+
+
+def pokertest_quality_hands(hands):
+    scores, names = [], []
+    for cards in hands:
+        score, name = pokertest.quality_of(cards)
+        scores.append(score)
+        names.append(name)
+    return scores, names
+
+
+def batch_hands(hands):
+    categories, strengths = evaluate_batch(np.array(hands))
+    return strengths.tolist(), [poker.HAND_NAMES[category] for category in categories]
+
+
+# name -> (evaluator, whether it runs on whole batches)
+EVALUATORS = {
+    "poker.classify": (classify_hands, False),
+    "poker.evaluate7": (evaluate7_hands, False),
+    "poker.Hand.quality": (hand_quality_hands, False),
+    "pokertest.Hand.quality": (pokertest_quality_hands, False),
+    "pokerbatch.evaluate_batch": (batch_hands, True),
+}
+
+
+def hand_str(cards):
+    return " ".join(poker.card_str(card) for card in cards)
+
+
+def differential(evaluator, hands, keys=None):
+    """
+    Check an evaluator against the reference on the given hands.
+
+    Returns None if it agrees, otherwise a description of the first hand
+    (or pair of hands) it gets wrong.
+    """
+    keys = reference_keys(hands) if keys is None else keys
+    try:
+        scores, names = evaluator(hands)
+    except Exception as error:
+        return {"error": repr(error)}
+    for cards, key, name in zip(hands, keys, names):
+        if poker.HAND_NAMES[key[0]] != name:
+            return {"hand": hand_str(cards), "expected": poker.HAND_NAMES[key[0]], "got": name}
+    order = sorted(range(len(hands)), key=lambda i: keys[i])
+    for i, j in zip(order, order[1:]):
+        if (keys[i] < keys[j] and not scores[i] < scores[j]) or (keys[i] == keys[j] and scores[i] != scores[j]):
+            relation = "beat" if keys[i] < keys[j] else "tie"
+            return {"hand": hand_str(hands[j]), "other": hand_str(hands[i]),
+                    "expected": f"should {relation}", "got": [scores[j], scores[i]]}
+    return None
+
+
+def hands_per_second(evaluator, hands, repeats=3):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        evaluator(hands)
+        best = min(best, time.perf_counter() - start)
+    return len(hands) / best
+
+
+def enumeration_rate(chunks):
+    start = time.perf_counter()
+    total = sum(chunk[1] - chunk[0] for chunk in chunks)
+    for chunk in chunks:
+        count_chunk(chunk)
+    return total / (time.perf_counter() - start)
+
+
+def run_benchmarks(sizes=(1000, 10000, 100000), samples=20000, prefix=(30, 31),
+                   output="bench_results.json", baseline=None, seed=0, slow_limit=10000):
+    """
+    Time and cross-check every evaluator, then save the results.
+
+    Parameters
+    ----------
+    sizes : tuple of int
+        Hand counts each evaluator is timed on.
+    samples : int
+        Random hands used for the differential test.
+    prefix : tuple of int
+        The differential test also covers every hand whose two lowest cards
+        are these, exhaustively.
+    output : str
+        JSON file the results are written to.
+    baseline : str, optional
+        Results of an earlier run; throughput drops of over 20% are reported.
+        Defaults to the previous contents of output.
+    seed : int
+        Seed for the random hands.
+    slow_limit : int
+        Largest size the per-hand pure Python evaluators are timed on.
+
+    Returns
+    -------
+    dict
+        The results that were saved.
+    """
+    rng = random.Random(seed)
+    baseline = output if baseline is None else baseline
+    previous = None
+    if os.path.exists(baseline):
+        with open(baseline) as f:
+            previous = json.load(f)
+
+    results = {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "python": platform.python_version(),
+               "throughput": {}, "differential": {}}
+    for name, (evaluator, batched) in EVALUATORS.items():
+        rates = {}
+        for size in sizes:
+            if not batched and size > slow_limit:
+                continue
+            hands = [rng.sample(range(52), 7) for _ in range(size)]
+            rates[str(size)] = hands_per_second(evaluator, hands)
+            print(f"{name} on {size} hands: {rates[str(size)]:,.0f} hands/s")
+        results["throughput"][name] = rates
+
+    chunks = [chunk for chunk in plan_chunks() if chunk[2] == prefix[0]][:5]
+    results["throughput"]["pokerenum.count_chunk"] = {str(sum(c[1] - c[0] for c in chunks)): enumeration_rate(chunks)}
+    print(f"pokerenum.count_chunk: {results['throughput']['pokerenum.count_chunk']}")
+
+    counts = five_card_counts()
+    results["five_card_counts"] = {name: {"count": count, "expected": KNOWN_FIVE_CARD_FREQUENCIES[name]}
+                                   for name, count in counts.items()}
+    for name, count in counts.items():
+        if count != KNOWN_FIVE_CARD_FREQUENCIES[name]:
+            print(f"{name}: {count} five-card hands, expected {KNOWN_FIVE_CARD_FREQUENCIES[name]}")
+    print(f"Five-card category counts {'match' if counts == KNOWN_FIVE_CARD_FREQUENCIES else 'differ'}")
+
+    random_hands = [sorted(rng.sample(range(52), 7)) for _ in range(samples)]
+    exhaustive = [list(prefix) + list(rest) for rest in combinations(range(prefix[1] + 1, 52), 5)]
+    for sample_name, hands in (("random", random_hands), ("exhaustive", exhaustive)):
+        keys = reference_keys(hands)
+        for name, (evaluator, _) in EVALUATORS.items():
+            disagreement = differential(evaluator, hands, keys)
+            results["differential"].setdefault(name, {})[sample_name] = disagreement
+            status = "agrees" if disagreement is None else f"first disagreement: {disagreement}"
+            print(f"{name} on {len(hands)} {sample_name} hands {status}")
+
+    if previous is not None:
+        for name, rates in results["throughput"].items():
+            for size, rate in rates.items():
+                old = previous.get("throughput", {}).get(name, {}).get(size)
+                if old and rate < old * 0.8:
+                    print(f"Regression: {name} on {size} hands fell from {old:,.0f} to {rate:,.0f} hands/s")
+
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    run_benchmarks()
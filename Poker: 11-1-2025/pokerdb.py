@@ -0,0 +1,186 @@
+import os
+import time
+from functools import lru_cache
+from math import comb
+from multiprocessing import Pool
+
+import numpy as np
+
+from poker import CATEGORY, CATEGORY_INDEX
+from pokerbatch import CARD_RANK_KEYS, CARD_NIBBLES, CARD_BITS, table_strengths
+from pokerenum import TOTAL_HANDS
+from pokerequity import combination_array
+
+# A precomputed strength for every 7-card hand.
+#
+# Hands are numbered by the combinatorial number system: the sorted cards
+# c0 < c1 < ... < c6 sit at index C(c0, 1) + C(c1, 2) + ... + C(c6, 7). That
+# orders hands colexicographically, by highest card first, so every hand whose
+# two highest cards are (f, g) fills the contiguous range starting at
+# C(g, 7) + C(f, 6), and its five lower cards run through the first C(f, 5)
+# colex 5-card combinations. The builder scores one such block at a time from
+# shared partial sums of those combinations.
+#
+# The database is a directory of .npy files that are memory-mapped on first
+# use, so a lookup is one index computation and one read:
+#   strengths.npy  uint16 strength of every hand, by index
+#   order.npy      uint32 hand indexes sorted by strength (stable)
+#   offsets.npy    where each strength starts in order.npy
+# A category covers a contiguous run of strengths, so the hands of any
+# category or strength are one slice of order.npy.
+
+DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hand_db")
+databases = {}
+
+# CHOOSE[card][i] = C(card, i + 1), the contribution of card as the i-th lowest
+CHOOSE = [[comb(card, i + 1) for i in range(7)] for card in range(52)]
+CHOOSE_ARRAY = np.array(CHOOSE, dtype=np.int64)
+
+# Strength range of each category, for slicing order.npy
+CATEGORY_STRENGTHS = {}
+for strength, category in enumerate(CATEGORY):
+    if strength:
+        low, high = CATEGORY_STRENGTHS.get(category, (strength, strength))
+        CATEGORY_STRENGTHS[category] = (min(low, strength), max(high, strength))
+
+
+def hand_index(cards):
+    """Index of a 7-card hand (card ids in any order) in the database."""
+    return sum(CHOOSE[card][i] for i, card in enumerate(sorted(cards)))
+
+
+def hand_indexes(hands):
+    """Indexes of an (N, 7) array of hands."""
+    hands = np.sort(np.asarray(hands, dtype=np.int64), axis=1)
+    return CHOOSE_ARRAY[hands, np.arange(7)].sum(axis=1)
+
+
+def hand_from_index(index):
+    """The sorted cards of the hand at an index."""
+    cards = []
+    for i in range(6, -1, -1):
+        # The largest card whose contribution still fits
+        card = i
+        while card + 1 < 52 and CHOOSE[card + 1][i] <= index:
+            card += 1
+        index -= CHOOSE[card][i]
+        cards.append(card)
+    return tuple(reversed(cards))
+
+
+@lru_cache(maxsize=None)
+def colex_partials():
+    """Rank keys, suit counts and masks of every 5-card combination of range(50), in colex order."""
+    combos = combination_array(50, 5)
+    combos = combos[np.lexsort(combos.T)]
+    return (CARD_RANK_KEYS[combos].sum(axis=1), CARD_NIBBLES[combos].sum(axis=1),
+            CARD_BITS[combos].sum(axis=1))
+
+
+def score_block(top):
+    """Strengths of every hand whose two highest cards are top = (f, g), in index order."""
+    f, g = top
+    keys, nibbles, masks = (partial[:comb(f, 5)] for partial in colex_partials())
+    keys = keys + CARD_RANK_KEYS[f] + CARD_RANK_KEYS[g]
+    nibbles = nibbles + CARD_NIBBLES[f] + CARD_NIBBLES[g]
+    top_mask = CARD_BITS[f] | CARD_BITS[g]
+    return comb(g, 7) + comb(f, 6), table_strengths(keys, nibbles, lambda rows: masks[rows] | top_mask)
+
+
+def build_database(path=DATABASE, processes=None, printer=False):
+    """
+    Score every 7-card hand and save the database to the directory path.
+
+    The blocks are scored across a process pool and written straight into a
+    memory-mapped file, then indexed by strength with a counting sort. Files
+    are written under temporary names and renamed once complete, so an
+    interrupted build never leaves a database that looks finished.
+    """
+    os.makedirs(path, exist_ok=True)
+    strengths_path = os.path.join(path, "strengths.npy")
+    order_path = os.path.join(path, "order.npy")
+    offsets_path = os.path.join(path, "offsets.npy")
+
+    start = time.time()
+    strengths = np.lib.format.open_memmap(strengths_path + ".tmp", mode="w+", dtype=np.uint16,
+                                          shape=(TOTAL_HANDS,))
+    histogram = np.zeros(len(CATEGORY), dtype=np.int64)
+    blocks = [(f, g) for g in range(51, 5, -1) for f in range(g - 1, 4, -1)]
+    with Pool(processes) as pool:
+        for done, (first, block) in enumerate(pool.imap_unordered(score_block, blocks), 1):
+            strengths[first:first + len(block)] = block
+            histogram += np.bincount(block, minlength=len(CATEGORY))
+            if printer and done % 50 == 0:
+                print(f"{done}/{len(blocks)} blocks scored ({time.time() - start:.0f}s)")
+
+    offsets = np.concatenate([[0], np.cumsum(histogram)])
+    order = np.lib.format.open_memmap(order_path + ".tmp", mode="w+", dtype=np.uint32,
+                                      shape=(TOTAL_HANDS,))
+    cursor = offsets[:-1].copy()
+    step = 1 << 22
+    for first in range(0, TOTAL_HANDS, step):
+        block = np.asarray(strengths[first:first + step])
+        ranked = np.argsort(block, kind="stable")
+        sorted_block = block[ranked]
+        counts = np.bincount(sorted_block, minlength=len(CATEGORY))
+        within = np.arange(len(block)) - (np.cumsum(counts) - counts)[sorted_block]
+        order[cursor[sorted_block] + within] = first + ranked
+        cursor += counts
+        if printer:
+            print(f"{min(first + step, TOTAL_HANDS)}/{TOTAL_HANDS} hands indexed ({time.time() - start:.0f}s)")
+
+    strengths.flush()
+    order.flush()
+    del strengths, order
+    np.save(offsets_path + ".tmp.npy", offsets)
+    os.replace(offsets_path + ".tmp.npy", offsets_path)
+    os.replace(order_path + ".tmp", order_path)
+    os.replace(strengths_path + ".tmp", strengths_path)
+    databases.pop(path, None)
+
+
+def load_database(path=DATABASE):
+    """The memory-mapped arrays of a database, opened once per path."""
+    if path not in databases:
+        databases[path] = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+                           for name in ("strengths", "order", "offsets")}
+    return databases[path]
+
+
+def lookup(cards, path=DATABASE):
+    """Strength of one 7-card hand, as poker.evaluate() gives it."""
+    return int(load_database(path)["strengths"][hand_index(cards)])
+
+
+def lookup_batch(hands, path=DATABASE):
+    """Strengths of an (N, 7) array of hands."""
+    return load_database(path)["strengths"][hand_indexes(hands)]
+
+
+def strength_hands(strength, path=DATABASE):
+    """Indexes of every hand with this strength."""
+    database = load_database(path)
+    offsets = database["offsets"]
+    return database["order"][offsets[strength]:offsets[strength + 1]]
+
+
+def category_hands(name, path=DATABASE):
+    """Indexes of every hand in a category, weakest first."""
+    database = load_database(path)
+    low, high = CATEGORY_STRENGTHS[CATEGORY_INDEX[name]]
+    offsets = database["offsets"]
+    return database["order"][offsets[low]:offsets[high + 1]]
+
+
+def category_counts(path=DATABASE):
+    """Number of hands in each category."""
+    offsets = load_database(path)["offsets"]
+    return {name: int(offsets[CATEGORY_STRENGTHS[index][1] + 1] - offsets[CATEGORY_STRENGTHS[index][0]])
+            for name, index in CATEGORY_INDEX.items()}
+
+
+if __name__ == "__main__":
+    if not os.path.exists(os.path.join(DATABASE, "strengths.npy")):
+        build_database(printer=True)
+    for name, count in category_counts().items():
+        print(f"{name}: {count}")
@@ -0,0 +1,236 @@
+import json
+import os
+import time
+from itertools import combinations
+from math import comb
+from multiprocessing import Pool
+
+from poker import (RANK_KEY, SUIT_NIBBLE, FLUSH_SHIFT, RANK_MASK, RANK_TABLE, FLUSH_TABLE,
+                   CATEGORY, HAND_NAMES, TABLE_VERSION, card_str, hand_name, evaluate7)
+
+# Exhaustive enumeration of all C(52, 7) seven-card hands.
+#
+# Hands are numbered by their lexicographic rank in combinations(range(52), 7),
+# the same order test_all_7_card_hands() walked them in. Every hand sharing its
+# two lowest cards (a, b) sits in one contiguous rank range, so the work is
+# split into those 1081 ranges and handed to a process pool, largest first.
+# Workers return category counts and a strength histogram rather than hands,
+# and finished ranges are checkpointed so an interrupted run picks up where it
+# stopped. The checkpoint records the evaluator and table version it was made
+# with, and is deleted once every range is done.
+
+TOTAL_HANDS = comb(52, 7)
+
+# Known 7-card category frequencies
+KNOWN_FREQUENCIES = {
+    "Straight Flush": 41584, "Four of a Kind": 224848, "Full House": 3473184,
+    "Flush": 4047644, "Straight": 6180020, "Three of a Kind": 6461620,
+    "Two Pair": 31433400, "Pair": 58627800, "High Card": 23294460
+}
+
+
+def combination_rank(cards, n=52):
+    """Lexicographic rank of a sorted combination among all combinations of range(n)."""
+    k = len(cards)
+    rank = 0
+    previous = -1
+    for i, card in enumerate(cards):
+        for skipped in range(previous + 1, card):
+            rank += comb(n - 1 - skipped, k - 1 - i)
+        previous = card
+    return rank
+
+
+def plan_chunks():
+    """
+    Split the hands into (start, stop, a, b) rank ranges, one per pair of
+    lowest cards (a, b), largest range first.
+    """
+    chunks = []
+    for a in range(46):
+        for b in range(a + 1, 47):
+            start = combination_rank((a, b) + tuple(range(b + 1, b + 6)))
+            chunks.append((start, start + comb(51 - b, 5), a, b))
+    chunks.sort(key=lambda chunk: chunk[0] - chunk[1])
+    return chunks
+
+
+def count_chunk(chunk):
+    """Strength histogram of every hand in one chunk, through the lookup tables."""
+    start, stop, a, b = chunk
+    histogram = [0] * len(CATEGORY)
+    key_b = RANK_KEY[a] + RANK_KEY[b]
+    suits_b = SUIT_NIBBLE[a] + SUIT_NIBBLE[b]
+    mask_b = 1 << a | 1 << b
+    # Partial rank keys, suit counts and masks are carried down the loops so
+    # the innermost one only adds its own card
+    for c in range(b + 1, 48):
+        key_c = key_b + RANK_KEY[c]
+        suits_c = suits_b + SUIT_NIBBLE[c]
+        mask_c = mask_b | 1 << c
+        for d in range(c + 1, 49):
+            key_d = key_c + RANK_KEY[d]
+            suits_d = suits_c + SUIT_NIBBLE[d]
+            mask_d = mask_c | 1 << d
+            for e in range(d + 1, 50):
+                key_e = key_d + RANK_KEY[e]
+                suits_e = suits_d + SUIT_NIBBLE[e] + 0x3333
+                mask_e = mask_d | 1 << e
+                for f in range(e + 1, 51):
+                    key_f = key_e + RANK_KEY[f]
+                    suits_f = suits_e + SUIT_NIBBLE[f]
+                    mask_f = mask_e | 1 << f
+                    for g in range(f + 1, 52):
+                        flush = (suits_f + SUIT_NIBBLE[g]) & 0x8888
+                        if flush:
+                            histogram[FLUSH_TABLE[(mask_f | 1 << g) >> FLUSH_SHIFT[flush]
+                                                  & RANK_MASK]] += 1
+                        else:
+                            histogram[RANK_TABLE[key_f + RANK_KEY[g]]] += 1
+    return start, [[strength, count] for strength, count in enumerate(histogram) if count]
+
+
+def walk_chunk(args):
+    """
+    Evaluate every hand in one chunk one at a time, optionally with another
+    evaluator and optionally writing each hand to a JSON lines file.
+    """
+    chunk, evaluator, hands_dir = args
+    start, stop, a, b = chunk
+    histogram = {}
+    out = None
+    if hands_dir is not None:
+        out = open(os.path.join(hands_dir, f"hands_{start}.jsonl"), "w")
+    try:
+        for rest in combinations(range(b + 1, 52), 5):
+            cards = (a, b) + rest
+            if evaluator is None:
+                quality = evaluate7(*cards)
+                hand_type = hand_name(quality)
+            else:
+                quality, hand_type = evaluator(cards)
+            histogram[quality, hand_type] = histogram.get((quality, hand_type), 0) + 1
+            if out is not None:
+                json.dump({"Hand": ", ".join(card_str(card) for card in cards),
+                           "Quality": quality, "Type": hand_type}, out)
+                out.write("\n")
+    finally:
+        if out is not None:
+            out.close()
+    return start, [[quality, hand_type, count] for (quality, hand_type), count in histogram.items()]
+
+
+def load_checkpoint(checkpoint, evaluator_name):
+    if checkpoint is None or not os.path.exists(checkpoint):
+        return set(), {}
+    with open(checkpoint) as f:
+        state = json.load(f)
+    if state["evaluator"] != evaluator_name:
+        raise ValueError(f"Checkpoint {checkpoint} was made with {state['evaluator']}, "
+                         f"not {evaluator_name}")
+    histogram = {(quality, hand_type): count for quality, hand_type, count in state["histogram"]}
+    return set(state["done"]), histogram
+
+
+def save_checkpoint(checkpoint, evaluator_name, done, histogram):
+    if checkpoint is None:
+        return
+    state = {
+        "evaluator": evaluator_name,
+        "done": sorted(done),
+        "histogram": [[quality, hand_type, count]
+                      for (quality, hand_type), count in sorted(histogram.items())]
+    }
+    # Write then rename so an interrupted save never leaves a broken checkpoint
+    with open(checkpoint + ".tmp", "w") as f:
+        json.dump(state, f)
+    os.replace(checkpoint + ".tmp", checkpoint)
+
+
+def enumerate_all_hands(processes=None, checkpoint="enumeration_checkpoint.json",
+                        evaluator=None, hands_dir=None, save_every=10.0, printer=False):
+    """
+    Evaluate every 7-card hand across a process pool.
+
+    Parameters
+    ----------
+    processes : int, optional
+        Worker processes, defaults to one per core.
+    checkpoint : str or None
+        JSON file progress is saved to and resumed from, removed once the
+        run completes. None disables it.
+    evaluator : callable, optional
+        A picklable function taking a sorted tuple of 7 card ids and returning
+        (score, hand_name). Defaults to the lookup tables in poker.py.
+    hands_dir : str, optional
+        If given, every hand is also written to a JSON lines file per chunk
+        in this directory.
+    save_every : float
+        Minimum seconds between checkpoint writes.
+    printer : bool
+        Whether to print progress as chunks finish.
+
+    Returns
+    -------
+    dict
+        'hands': the number of hands evaluated, 'categories': hands per
+        category name and 'histogram': hands per (score, hand_name).
+    """
+    evaluator_name = ("poker.evaluate7" if evaluator is None
+                      else f"{evaluator.__module__}.{evaluator.__qualname__}")
+    evaluator_name += f" (tables v{TABLE_VERSION})"
+    done, histogram = load_checkpoint(checkpoint, evaluator_name)
+    todo = [chunk for chunk in plan_chunks() if chunk[0] not in done]
+    if hands_dir is not None:
+        os.makedirs(hands_dir, exist_ok=True)
+    fast = evaluator is None and hands_dir is None
+    sizes = {chunk[0]: chunk[1] - chunk[0] for chunk in plan_chunks()}
+
+    last_save = time.time()
+    try:
+        with Pool(processes) as pool:
+            if fast:
+                results = pool.imap_unordered(count_chunk, todo)
+            else:
+                results = pool.imap_unordered(walk_chunk, [(chunk, evaluator, hands_dir)
+                                                           for chunk in todo])
+            for start, counts in results:
+                for entry in counts:
+                    if fast:
+                        quality, count = entry
+                        key = (quality, hand_name(quality))
+                    else:
+                        quality, hand_type, count = entry
+                        key = (quality, hand_type)
+                    histogram[key] = histogram.get(key, 0) + count
+                done.add(start)
+                if printer:
+                    finished = sum(sizes[chunk] for chunk in done)
+                    print(f"{finished}/{TOTAL_HANDS} hands ({finished / TOTAL_HANDS * 100:.2f}%)")
+                if time.time() - last_save >= save_every:
+                    save_checkpoint(checkpoint, evaluator_name, done, histogram)
+                    last_save = time.time()
+    finally:
+        if len(done) < len(sizes):
+            save_checkpoint(checkpoint, evaluator_name, done, histogram)
+        elif checkpoint is not None and os.path.exists(checkpoint):
+            # A finished run is never resumed, so a rerun counts afresh
+            os.remove(checkpoint)
+
+    categories = {name: 0 for name in reversed(HAND_NAMES)}
+    for (quality, hand_type), count in histogram.items():
+        categories[hand_type] = categories.get(hand_type, 0) + count
+    return {"hands": sum(categories.values()), "categories": categories, "histogram": histogram}
+
+
+def report(results):
+    """Print category counts next to the known frequencies."""
+    for name, count in results["categories"].items():
+        expected = KNOWN_FREQUENCIES.get(name)
+        status = "ok" if count == expected else f"expected {expected}"
+        print(f"{name}: {count} ({count / TOTAL_HANDS * 100:.4f}%) {status}")
+    print(f"Total: {results['hands']} of {TOTAL_HANDS}")
+
+
+if __name__ == "__main__":
+    report(enumerate_all_hands(printer=True))
@@ -0,0 +1,431 @@
+import json
+import os
+import time
+from functools import lru_cache
+from itertools import permutations
+from math import comb
+from multiprocessing import Pool
+from statistics import NormalDist
+
+import numpy as np
+
+from poker import parse_cards, card_str, RANKS, TABLE_VERSION, save_tables, load_tables
+from pokerbatch import evaluate_batch, deal_cards, showdown, CARD_BITS
+
+# Equity of known hands, estimated by dealing random completions of the board.
+#
+# Each batch deals batch_size boards at once and scores every player's seven
+# cards with evaluate_batch. A player's equity on a board is their share of the
+# pot: 1 for an outright win, 1/k for a k-way tie and 0 otherwise. Batches run
+# until the standard error of every player's equity is below the tolerance.
+
+
+def as_cards(cards):
+    """Card ids from a string like 'AsKh' or an iterable of ids."""
+    if isinstance(cards, str):
+        return parse_cards(cards)
+    return [int(card) for card in cards]
+
+
+def check_cards(hole_cards, board, dead):
+    """Validate a spot and return the card ids still in the deck."""
+    if len(board) > 5:
+        raise ValueError("The board has at most 5 cards")
+    for hole in hole_cards:
+        if len(hole) != 2:
+            raise ValueError("Every player needs exactly 2 hole cards")
+    known = [card for hole in hole_cards for card in hole] + list(board) + list(dead)
+    if len(set(known)) != len(known):
+        raise ValueError("A card appears more than once")
+    if any(not 0 <= card < 52 for card in known):
+        raise ValueError("Card ids run from 0 to 51")
+    remaining = np.setdiff1d(np.arange(52), known)
+    if len(remaining) < 5 - len(board):
+        raise ValueError("Not enough cards left to complete the board")
+    return remaining
+
+
+def tally(hole_cards, boards, weights=None):
+    """
+    Score every player's hand on every board and tally the results.
+
+    Returns per-player sums of wins, ties and pot share, and the sum of
+    squared pot shares, as a (4, players) array. Each board counts with its
+    weight if weights are given.
+    """
+    players = len(hole_cards)
+    hands = np.empty((players, len(boards), 7), dtype=np.int64)
+    for i, hole in enumerate(hole_cards):
+        hands[i, :, :2] = hole
+        hands[i, :, 2:] = boards
+    strengths = evaluate_batch(hands.reshape(-1, 7))[1].reshape(players, len(boards))
+
+    winners, split, share = showdown(strengths.T)
+    if weights is None:
+        weights = np.ones(len(boards))
+    weights = weights[:, None]
+    return np.stack([((winners & (split[:, None] == 1)) * weights).sum(axis=0),
+                     ((winners & (split[:, None] > 1)) * weights).sum(axis=0),
+                     (share * weights).sum(axis=0),
+                     (share ** 2 * weights).sum(axis=0)])
+
+
+def showdown_counts(hole_cards, board, remaining, batch_size, seed):
+    """Deal batch_size random board completions and tally them."""
+    rng = np.random.default_rng(seed)
+    completions = deal_cards(rng, batch_size, 5 - len(board), remaining)
+    boards = np.hstack([np.broadcast_to(np.asarray(board, dtype=np.uint8), (batch_size, len(board))),
+                        completions])
+    return tally(hole_cards, boards)
+
+
+def monte_carlo_equity(hole_cards, board=(), dead=(), tolerance=0.005, confidence=0.95,
+                       batch_size=10000, max_samples=10_000_000, processes=1, seed=None):
+    """
+    Estimate each player's equity by dealing random board completions.
+
+    Parameters
+    ----------
+    hole_cards : list
+        Each player's two hole cards, as 'AsKh' strings or lists of card ids.
+    board : str or list, optional
+        Community cards already dealt (0 to 5).
+    dead : str or list, optional
+        Cards known to be out of the deck.
+    tolerance : float
+        Stop once the standard error of every player's equity is below this.
+    confidence : float
+        Coverage of the returned confidence intervals.
+    batch_size : int
+        Boards dealt per batch.
+    max_samples : int
+        Stop after this many boards even if the tolerance was not reached.
+    processes : int
+        Worker processes; each round runs one batch per process.
+    seed : int, optional
+        Seed for reproducible runs.
+
+    Returns
+    -------
+    dict
+        'samples' and 'seconds', and 'players': one dict per player with
+        'win', 'tie', 'lose' and 'equity' estimates, the 'stderr' of the
+        equity and an (low, high) interval for each estimate.
+    """
+    start = time.perf_counter()
+    hole_cards = [as_cards(hole) for hole in hole_cards]
+    board = as_cards(board)
+    dead = as_cards(dead)
+    remaining = check_cards(hole_cards, board, dead)
+    seeds = np.random.SeedSequence(seed)
+
+    totals = np.zeros((4, len(hole_cards)))
+    samples = 0
+    pool = Pool(processes) if processes > 1 else None
+    try:
+        while True:
+            jobs = [(hole_cards, board, remaining, batch_size, child)
+                    for child in seeds.spawn(processes)]
+            if pool is not None:
+                results = pool.starmap(showdown_counts, jobs)
+            else:
+                results = [showdown_counts(*job) for job in jobs]
+            for result in results:
+                totals += result
+                samples += batch_size
+            mean = totals[2] / samples
+            stderr = np.sqrt(np.maximum(totals[3] / samples - mean ** 2, 0) / samples)
+            if stderr.max() < tolerance or samples >= max_samples:
+                break
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    players = []
+    for i, hole in enumerate(hole_cards):
+        win = float(totals[0, i] / samples)
+        tie = float(totals[1, i] / samples)
+        result = {"hand": " ".join(card_str(card) for card in hole),
+                  "win": win, "tie": tie, "lose": 1 - win - tie,
+                  "equity": float(mean[i]), "stderr": float(stderr[i])}
+        for name in ("win", "tie", "lose"):
+            p = result[name]
+            margin = z * (max(p * (1 - p), 0.0) / samples) ** 0.5
+            result[f"{name}_interval"] = (max(p - margin, 0.0), min(p + margin, 1.0))
+        margin = z * result["stderr"]
+        result["equity_interval"] = (result["equity"] - margin, result["equity"] + margin)
+        players.append(result)
+    return {"samples": samples, "seconds": time.perf_counter() - start, "players": players}
+
+
+
+# Exact equity
+#
+# Relabelling suits doesn't change who wins, so a board only needs to be
+# scored once per orbit of the suit permutations that leave every player's
+# hole cards (and the board and dead cards so far) where they are, and counts
+# with the size of that orbit. The same idea over all 24 permutations gives
+# the 169 preflop classes and the 1,755 distinct flops.
+
+SUIT_PERMUTATIONS = list(permutations(range(4)))
+# PERMUTED_CARDS[p, card] is card with its suit relabelled by permutation p
+PERMUTED_CARDS = np.array([[perm[card // 13] * 13 + card % 13 for card in range(52)]
+                           for perm in SUIT_PERMUTATIONS])
+# The preflop table is written like poker.py's table cache, with a manifest
+# of TABLE_VERSION and a checksum, so a stale or damaged table is refused
+PREFLOP_TABLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "preflop_table")
+preflop_tables = {}
+
+
+@lru_cache(maxsize=None)
+def combination_array(n, k):
+    """All k-combinations of range(n) in lexicographic order, as a (C(n, k), k) array."""
+    combos = np.zeros((1, 0), dtype=np.uint8)
+    for _ in range(k):
+        last = combos[:, -1].astype(np.int64) if combos.shape[1] else np.full(len(combos), -1)
+        counts = n - 1 - last
+        rows = np.repeat(combos, counts, axis=0)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        combos = np.hstack([rows, (np.repeat(last + 1, counts) + offsets)[:, None].astype(np.uint8)])
+    return combos
+
+
+def card_mask(cards):
+    return sum(1 << int(card) for card in cards)
+
+
+def stabilizer(groups):
+    """Indexes of the suit permutations that map every group of cards onto itself."""
+    return [p for p in range(len(SUIT_PERMUTATIONS))
+            if all(card_mask(PERMUTED_CARDS[p, group]) == card_mask(group) for group in groups)]
+
+
+def canonical_boards(boards, perms):
+    """
+    Collapse rows of card ids into one representative per orbit under the
+    given suit permutations, returning the representatives and orbit sizes.
+    """
+    keys = None
+    for p in perms:
+        masks = CARD_BITS[PERMUTED_CARDS[p][boards]].sum(axis=1)
+        keys = masks if keys is None else np.minimum(keys, masks)
+    _, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    return boards[first], counts
+
+
+def canonical_flops():
+    """The 1,755 flops that differ by more than suit labels, with how many flops each stands for."""
+    return canonical_boards(combination_array(52, 3).astype(np.int64), range(len(SUIT_PERMUTATIONS)))
+
+
+def exact_equity(hole_cards, board=(), dead=(), chunk_size=200_000):
+    """
+    Exact equity of each player over every completion of the board.
+
+    Takes the same hole_cards, board and dead arguments as monte_carlo_equity
+    and returns the same result, with exact probabilities, 'boards' (the
+    number of completions) and 'scored' (the boards left after collapsing
+    suit-isomorphic ones).
+    """
+    start = time.perf_counter()
+    hole_cards = [as_cards(hole) for hole in hole_cards]
+    board = as_cards(board)
+    dead = as_cards(dead)
+    remaining = check_cards(hole_cards, board, dead)
+
+    missing = 5 - len(board)
+    completions = remaining[combination_array(len(remaining), missing)]
+    boards = np.hstack([np.broadcast_to(np.asarray(board, dtype=np.int64), (len(completions), len(board))),
+                        completions])
+    perms = stabilizer(hole_cards + [board, dead])
+    weights = None
+    if len(perms) > 1:
+        boards, weights = canonical_boards(boards, perms)
+
+    totals = np.zeros((4, len(hole_cards)))
+    for i in range(0, len(boards), chunk_size):
+        totals += tally(hole_cards, boards[i:i + chunk_size],
+                        None if weights is None else weights[i:i + chunk_size])
+    total = comb(len(remaining), missing)
+
+    players = []
+    for i, hole in enumerate(hole_cards):
+        win = float(totals[0, i] / total)
+        tie = float(totals[1, i] / total)
+        players.append({"hand": " ".join(card_str(card) for card in hole),
+                        "win": win, "tie": tie, "lose": 1 - win - tie,
+                        "equity": float(totals[2, i] / total)})
+    return {"boards": total, "scored": len(boards), "seconds": time.perf_counter() - start,
+            "players": players}
+
+
+def preflop_class(hole):
+    """The preflop class of two hole cards, e.g. 'AA', 'AKs' or 'T9o'."""
+    high, low = sorted(as_cards(hole), key=lambda card: card % 13, reverse=True)
+    name = RANKS[high % 13] + RANKS[low % 13]
+    if high % 13 == low % 13:
+        return name
+    return name + ("s" if high // 13 == low // 13 else "o")
+
+
+# The 169 preflop classes, pairs first then suited and offsuit, high cards first
+PREFLOP_CLASSES = ([RANKS[rank] * 2 for rank in range(12, -1, -1)]
+                   + [RANKS[high] + RANKS[low] + kind for kind in "so"
+                      for high in range(12, -1, -1) for low in range(high - 1, -1, -1)])
+CLASS_INDEX = {name: i for i, name in enumerate(PREFLOP_CLASSES)}
+# Every two-card combination, and the class each one belongs to
+HOLE_COMBOS = combination_array(52, 2).astype(np.int64)
+COMBO_CLASSES = np.array([CLASS_INDEX[preflop_class(combo)] for combo in HOLE_COMBOS])
+
+
+def class_combos(name):
+    """The hole card combinations in a preflop class (6, 4 or 12 of them)."""
+    return [tuple(combo) for combo, index in zip(HOLE_COMBOS.tolist(), COMBO_CLASSES)
+            if index == CLASS_INDEX[name]]
+
+
+def canonical_matchups(classes=None):
+    """
+    Every heads-up matchup of disjoint hole cards, collapsed under all suit
+    permutations.
+
+    Returns the representative matchups as an (M, 2) array of indexes into
+    HOLE_COMBOS, and for every matchup (a, b) of the full list: a, b, the
+    index of its representative and whether a plays the representative's
+    first hand.
+    """
+    combo_masks = CARD_BITS[HOLE_COMBOS].sum(axis=1)
+    combo_index = {int(mask): i for i, mask in enumerate(combo_masks)}
+    # PERMUTED_COMBOS[p, i] is combo i with its suits relabelled by permutation p
+    permuted_combos = np.array([[combo_index[int(mask)] for mask in CARD_BITS[PERMUTED_CARDS[p][HOLE_COMBOS]].sum(axis=1)]
+                                for p in range(len(SUIT_PERMUTATIONS))])
+
+    a, b = np.triu_indices(len(HOLE_COMBOS), k=1)
+    keep = (combo_masks[a] & combo_masks[b]) == 0
+    if classes is not None:
+        wanted = np.isin(COMBO_CLASSES, [CLASS_INDEX[name] for name in classes])
+        keep &= wanted[a] & wanted[b]
+    a, b = a[keep], b[keep]
+
+    best = first = None
+    for p in range(len(SUIT_PERMUTATIONS)):
+        pa, pb = permuted_combos[p, a], permuted_combos[p, b]
+        keys = np.minimum(pa, pb) * len(HOLE_COMBOS) + np.maximum(pa, pb)
+        if best is None:
+            best, first = keys, pa < pb
+        else:
+            better = keys < best
+            best = np.where(better, keys, best)
+            first = np.where(better, pa < pb, first)
+    keys, representative = np.unique(best, return_inverse=True)
+    matchups = np.stack([keys // len(HOLE_COMBOS), keys % len(HOLE_COMBOS)], axis=1)
+    return matchups, a, b, representative, first
+
+
+def matchup_equity(matchup):
+    """Exact (win, tie) of the first hand in a matchup of HOLE_COMBOS indexes."""
+    result = exact_equity([HOLE_COMBOS[matchup[0]], HOLE_COMBOS[matchup[1]]])
+    return tuple(int(index) for index in matchup), result["players"][0]["win"], result["players"][0]["tie"]
+
+
+def build_preflop_table(path=PREFLOP_TABLE, processes=None, checkpoint="preflop_checkpoint.json",
+                        classes=None, save_every=10.0, printer=False):
+    """
+    Compute exact heads-up equity for every pair of preflop classes.
+
+    Every suit-isomorphic matchup is enumerated once across a process pool,
+    and finished matchups are checkpointed like pokerenum does so a long
+    build can be resumed. The checkpoint records TABLE_VERSION, one made with
+    other tables is refused, and it is deleted once every matchup is done.
+
+    The table is a (2, 169, 169) float32 array of the row class's win and tie
+    probability against the column class, averaged over all their
+    non-conflicting combinations, saved to the directory path with
+    poker.save_tables() so it carries TABLE_VERSION and a checksum. Pass a
+    list of class names as classes to only fill in matchups between those
+    classes.
+    """
+    matchups, a, b, representative, first = canonical_matchups(classes)
+    results = {}
+    if checkpoint is not None and os.path.exists(checkpoint):
+        with open(checkpoint) as f:
+            state = json.load(f)
+        version = state.get("version") if isinstance(state, dict) else None
+        if version != TABLE_VERSION:
+            raise ValueError(f"Checkpoint {checkpoint} was made with tables v{version}, not "
+                             f"v{TABLE_VERSION}; delete it to start the build afresh")
+        results = {tuple(key): (win, tie) for key, win, tie in state["results"]}
+
+    def save():
+        if checkpoint is None:
+            return
+        with open(checkpoint + ".tmp", "w") as f:
+            json.dump({"version": TABLE_VERSION,
+                       "results": [[list(key), win, tie] for key, (win, tie) in results.items()]}, f)
+        os.replace(checkpoint + ".tmp", checkpoint)
+
+    todo = [matchup for matchup in matchups.tolist() if tuple(matchup) not in results]
+    last_save = time.time()
+    try:
+        with Pool(processes) as pool:
+            for key, win, tie in pool.imap_unordered(matchup_equity, todo, chunksize=4):
+                results[key] = (win, tie)
+                if printer:
+                    print(f"{len(results)}/{len(matchups)} matchups")
+                if time.time() - last_save >= save_every:
+                    save()
+                    last_save = time.time()
+    finally:
+        if len(results) < len(matchups):
+            save()
+        elif checkpoint is not None and os.path.exists(checkpoint):
+            # A finished build is never resumed, so a rebuild starts afresh
+            os.remove(checkpoint)
+
+    outcome = np.array([results[tuple(matchup)] for matchup in matchups.tolist()])
+    win, tie = outcome[representative, 0], outcome[representative, 1]
+    # The second hand wins whenever the first neither wins nor ties
+    a_win = np.where(first, win, 1 - win - tie)
+    b_win = 1 - a_win - tie
+    rows = np.concatenate([COMBO_CLASSES[a], COMBO_CLASSES[b]])
+    columns = np.concatenate([COMBO_CLASSES[b], COMBO_CLASSES[a]])
+    size = len(PREFLOP_CLASSES)
+    counts = np.bincount(rows * size + columns, minlength=size * size)
+    table = np.stack([np.bincount(rows * size + columns, np.concatenate([a_win, b_win]), size * size),
+                      np.bincount(rows * size + columns, np.concatenate([tie, tie]), size * size)])
+    with np.errstate(invalid="ignore"):
+        table = (table / counts).reshape(2, size, size).astype(np.float32)
+    save_tables(path, {"preflop": ("f", table.ravel().tolist())})
+    preflop_tables.pop(path, None)
+    return table
+
+
+def preflop_equity(hand, other, path=PREFLOP_TABLE):
+    """
+    Heads-up preflop equity of one class against another from the precomputed
+    table. Hands are class names ('AKs') or hole cards, which are looked up by
+    their class. Returns (win, tie, equity) for the first hand.
+    """
+    if path not in preflop_tables:
+        tables = load_tables(path)
+        if tables is None or "preflop" not in tables:
+            raise ValueError(f"The preflop table at {path} is missing, from another TABLE_VERSION or "
+                             f"corrupt; rerun build_preflop_table()")
+        size = len(PREFLOP_CLASSES)
+        preflop_tables[path] = np.frombuffer(tables["preflop"], dtype=np.float32).reshape(2, size, size)
+    table = preflop_tables[path]
+    i = CLASS_INDEX[hand if isinstance(hand, str) and hand in CLASS_INDEX else preflop_class(hand)]
+    j = CLASS_INDEX[other if isinstance(other, str) and other in CLASS_INDEX else preflop_class(other)]
+    win, tie = float(table[0, i, j]), float(table[1, i, j])
+    return win, tie, win + tie / 2
+
+
+if __name__ == "__main__":
+    result = monte_carlo_equity(["AsAh", "KdKc"])
+    print(f"{result['samples']} boards in {result['seconds'] * 1000:.1f} ms")
+    for player in result["players"]:
+        low, high = player["equity_interval"]
+        print(f"{player['hand']}: win {player['win']:.4f}, tie {player['tie']:.4f}, "
+              f"lose {player['lose']:.4f}, equity {player['equity']:.4f} ({low:.4f}-{high:.4f})")
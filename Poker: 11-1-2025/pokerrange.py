@@ -0,0 +1,213 @@
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+from poker import RANKS, RANK_INDEX, SUIT_INDEX, SUIT_LETTERS, parse_cards, card_str
+from pokerbatch import CARD_RANK_KEYS, CARD_NIBBLES, CARD_BITS, table_strengths
+from pokerequity import as_cards, class_combos, combination_array
+
+# Range-vs-range equity.
+#
+# A range like "QQ+, AKs, A5s-A2s, AhKh:0.5" is expanded into hole card
+# combinations with weights. Combinations are compared as 52-bit card masks:
+# any that share a card with the board or dead cards are dropped, and pairs of
+# combinations that share a card with each other get no weight.
+#
+# Every combination of either range is scored once per runout, by adding its
+# hole cards to the runout's rank key, suit counts and mask, and those
+# strengths are shared by every pair the combination is part of. A
+# combination that collides with a runout is given a strength that can never
+# win or tie, so invalid pairs drop out of the comparisons, and the number of
+# boards each pair is valid on is a single matrix product.
+
+NO_HAND = 0        # strength for range A combinations blocked by the runout
+NEVER_BEATEN = 9999  # strength for range B combinations blocked by the runout
+
+
+def class_name(high, low, suffix=""):
+    return RANKS[high] + RANKS[low] + (suffix if high != low else "")
+
+
+def expand_hand(text):
+    """Hole card combinations for one entry of a range, e.g. 'TT+', 'A5s-A2s', 'KQ' or 'AhKh'."""
+    if len(text) == 4 and (text[1] in SUIT_LETTERS or text[1] in SUIT_INDEX):
+        cards = parse_cards(text)
+        return [tuple(sorted(cards))]
+    if "-" in text:
+        first, last = text.split("-")
+        suffix = first[2:]
+        high, low = RANK_INDEX[first[0]], RANK_INDEX[first[1]]
+        end = RANK_INDEX[last[1]]
+        if high == low:
+            # 22-55: pairs between the two
+            pair_ranks = range(min(high, RANK_INDEX[last[0]]), max(high, RANK_INDEX[last[0]]) + 1)
+            names = [class_name(rank, rank) for rank in pair_ranks]
+        else:
+            # A2s-A5s: same high card, kickers between the two
+            names = [class_name(high, kicker, suffix) for kicker in range(min(low, end), max(low, end) + 1)]
+    elif text.endswith("+"):
+        suffix = text[2:-1]
+        high, low = RANK_INDEX[text[0]], RANK_INDEX[text[1]]
+        if high == low:
+            names = [class_name(rank, rank) for rank in range(high, 13)]
+        else:
+            names = [class_name(high, kicker, suffix) for kicker in range(low, high)]
+    else:
+        high, low = sorted((RANK_INDEX[text[0]], RANK_INDEX[text[1]]), reverse=True)
+        names = [class_name(high, low, text[2:])]
+
+    combos = []
+    for name in names:
+        if len(name) == 2 and name[0] != name[1]:
+            # No suffix means both suited and offsuit
+            combos += class_combos(name + "s") + class_combos(name + "o")
+        else:
+            combos += class_combos(name)
+    return combos
+
+
+def parse_range(text):
+    """
+    Combinations and weights from range notation.
+
+    Entries are separated by commas and may end in ':weight'. Later entries
+    override the weight of combinations already in the range.
+    """
+    weights = {}
+    for entry in text.replace(" ", "").split(","):
+        if not entry:
+            continue
+        weight = 1.0
+        if ":" in entry:
+            entry, weight = entry.split(":")
+            weight = float(weight)
+        for combo in expand_hand(entry):
+            weights[combo] = weight
+    combos = np.array(list(weights), dtype=np.int64).reshape(-1, 2)
+    return combos, np.array(list(weights.values()))
+
+
+def combo_masks(combos):
+    return CARD_BITS[combos].sum(axis=1)
+
+
+def runout_counts(runouts, combos, index_a, index_b):
+    """
+    Wins, ties and valid boards for every pair of combinations over some runouts.
+
+    runouts is a (boards, 5) array of full boards, combos the union of both
+    ranges and index_a, index_b the rows of combos in each range.
+    """
+    board_keys = CARD_RANK_KEYS[runouts].sum(axis=1)
+    board_nibbles = CARD_NIBBLES[runouts].sum(axis=1)
+    board_masks = CARD_BITS[runouts].sum(axis=1)
+    masks = combo_masks(combos)
+
+    valid = (board_masks[:, None] & masks[None, :]) == 0
+    # A combination holding a runout card would make an impossible hand, so it
+    # is scored on the runout alone and the result thrown away below
+    keys = np.where(valid, board_keys[:, None] + CARD_RANK_KEYS[combos].sum(axis=1), board_keys[:, None])
+    nibbles = np.where(valid, board_nibbles[:, None] + CARD_NIBBLES[combos].sum(axis=1), board_nibbles[:, None])
+    strengths = table_strengths(keys, nibbles, lambda rows: board_masks[rows[0]] | masks[rows[1]] * valid[rows])
+
+    strengths_a = np.where(valid, strengths, NO_HAND)[:, index_a]
+    strengths_b = np.where(valid, strengths, NEVER_BEATEN)[:, index_b]
+    wins = np.zeros((len(index_a), len(index_b)), dtype=np.int32)
+    ties = np.zeros_like(wins)
+    for a, b in zip(strengths_a, strengths_b):
+        wins += a[:, None] > b[None, :]
+        ties += a[:, None] == b[None, :]
+    valid_a = valid[:, index_a].astype(np.float32)
+    valid_b = valid[:, index_b].astype(np.float32)
+    return wins, ties, (valid_a.T @ valid_b).astype(np.int32)
+
+
+def range_equity(range_a, range_b, board=(), dead=(), max_boards=20000, processes=1,
+                 chunk_size=256, seed=None):
+    """
+    Equity of one range against another.
+
+    Parameters
+    ----------
+    range_a, range_b : str or tuple
+        Range notation, or a (combos, weights) pair as parse_range returns.
+    board : str or list, optional
+        Community cards dealt so far.
+    dead : str or list, optional
+        Cards known to be out of the deck.
+    max_boards : int
+        Runouts are enumerated exactly when there are at most this many,
+        otherwise this many are sampled at random.
+    processes : int
+        Worker processes the runouts are split across.
+    chunk_size : int
+        Runouts scored per step.
+    seed : int, optional
+        Seed for sampled runouts.
+
+    Returns
+    -------
+    dict
+        'equity' of range A against range B, the 'matrix' of each A
+        combination's equity against each B combination (NaN for pairs that
+        share a card), their 'weights', the remaining 'combos_a' and
+        'combos_b', the number of 'boards' and 'seconds' taken.
+    """
+    start = time.perf_counter()
+    combos_a, weights_a = parse_range(range_a) if isinstance(range_a, str) else range_a
+    combos_b, weights_b = parse_range(range_b) if isinstance(range_b, str) else range_b
+    board = as_cards(board)
+    dead = as_cards(dead)
+    known = sum(1 << card for card in board + dead)
+    if len(board) > 5:
+        raise ValueError("The board has at most 5 cards")
+
+    # Blockers: drop combinations holding a board or dead card
+    keep_a = (combo_masks(combos_a) & known) == 0
+    keep_b = (combo_masks(combos_b) & known) == 0
+    combos_a, weights_a = combos_a[keep_a], weights_a[keep_a]
+    combos_b, weights_b = combos_b[keep_b], weights_b[keep_b]
+    if not len(combos_a) or not len(combos_b):
+        raise ValueError("A range has no combinations left after removing blocked cards")
+
+    combos, inverse = np.unique(np.vstack([combos_a, combos_b]), axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    index_a, index_b = inverse[:len(combos_a)], inverse[len(combos_a):]
+
+    remaining = np.array([card for card in range(52) if not known >> card & 1])
+    missing = 5 - len(board)
+    completions = combination_array(len(remaining), missing)
+    if len(completions) > max_boards:
+        rng = np.random.default_rng(seed)
+        completions = completions[rng.choice(len(completions), max_boards, replace=False)]
+    runouts = np.hstack([np.broadcast_to(np.asarray(board, dtype=np.int64), (len(completions), len(board))),
+                         remaining[completions]])
+
+    jobs = [(runouts[i:i + chunk_size], combos, index_a, index_b)
+            for i in range(0, len(runouts), chunk_size)]
+    if processes > 1:
+        with Pool(processes) as pool:
+            results = pool.starmap(runout_counts, jobs)
+    else:
+        results = [runout_counts(*job) for job in jobs]
+    wins = sum(result[0] for result in results)
+    ties = sum(result[1] for result in results)
+    boards = sum(result[2] for result in results)
+
+    overlap = (combo_masks(combos_a)[:, None] & combo_masks(combos_b)[None, :]) != 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        matrix = (wins + ties / 2) / boards
+    matrix[overlap | (boards == 0)] = np.nan
+    weights = np.where(np.isnan(matrix), 0.0, weights_a[:, None] * weights_b[None, :])
+    equity = float((np.nan_to_num(matrix) * weights).sum() / weights.sum())
+    return {"equity": equity, "matrix": matrix, "weights": weights,
+            "combos_a": [" ".join(card_str(card) for card in combo) for combo in combos_a],
+            "combos_b": [" ".join(card_str(card) for card in combo) for combo in combos_b],
+            "boards": len(runouts), "seconds": time.perf_counter() - start}
+
+
+if __name__ == "__main__":
+    result = range_equity("QQ+, AKs, AKo", "TT+, AQs+, KQs", board="Ts7h2c")
+    print(f"{len(result['combos_a'])} vs {len(result['combos_b'])} combos over {result['boards']} "
+          f"boards in {result['seconds']:.2f}s: equity {result['equity']:.4f}")
@@ -0,0 +1,332 @@
+import time
+
+import numpy as np
+
+from poker import CATEGORY_INDEX
+from pokerbatch import CARD_RANK_KEYS, CARD_NIBBLES, CARD_BITS, CATEGORIES, table_strengths, deal_cards
+
+# Self-play no-limit hold'em, many tables at once.
+#
+# Every table's state lives in (tables, seats) arrays: stacks, this street's
+# bets, chips put in over the hand, folds and who has acted since the last
+# full raise. The deck is dealt up front like simulate_poker deals it, hole
+# cards then the board, and every seat's showdown strength is scored then in
+# one batch; the board is only shown to policies street by street.
+#
+# A policy is a function of an observation (a dict of arrays, one row per
+# table where its seat is to act) returning an action and a raise-to amount
+# per row. step() asks each seat's policy once for all the tables waiting on
+# that seat, so the Python overhead is per seat per step, not per table.
+# When every table has finished the pots are split, side pots included, and
+# the outcomes are copied into preallocated record arrays.
+
+FOLD, CALL, RAISE = 0, 1, 2
+NO_CARD = 255  # board cards not dealt yet, as policies see them
+STREET_NAMES = ["Preflop", "Flop", "Turn", "River"]
+STREET_CARDS = np.array([0, 3, 4, 5])
+
+
+def outcome_dtype(num_players):
+    return np.dtype([
+        ("hole", np.uint8, (num_players, 2)), ("board", np.uint8, (5,)), ("button", np.uint8),
+        ("strengths", np.uint16, (num_players,)), ("folded", np.bool_, (num_players,)),
+        ("contributions", np.int32, (num_players,)), ("payoffs", np.float32, (num_players,)),
+        ("pot", np.int32), ("street", np.uint8), ("showdown", np.bool_)
+    ])
+
+
+class SelfPlayTables:
+    """
+    Tables of num_players seats, one policy per seat, stepped in lockstep.
+
+    Stacks are reset to `stack` chips every hand and the button moves one
+    seat per table and per hand, so seats see every position equally often.
+    `stack` is one size for every seat, one per seat, or a (tables, seats)
+    array; with unequal stacks players go all in for different amounts and
+    the pot splits into side pots.
+    """
+
+    def __init__(self, num_tables, policies, stack=200, small_blind=1, big_blind=2, rng=None):
+        if not 2 <= len(policies) <= 23:
+            raise ValueError("A table seats 2 to 23 players")
+        self.num_tables = num_tables
+        self.num_players = len(policies)
+        self.policies = policies
+        self.stack = np.broadcast_to(np.asarray(stack, dtype=np.int64), (num_tables, self.num_players))
+        self.small_blind = small_blind
+        self.big_blind = big_blind
+        self.rng = np.random.default_rng(rng)
+        self.hands_dealt = 0
+
+        tables, seats = num_tables, self.num_players
+        self.hole = np.empty((tables, seats, 2), dtype=np.uint8)
+        self.board = np.empty((tables, 5), dtype=np.uint8)
+        self.strengths = np.empty((tables, seats), dtype=np.uint16)
+        self.button = np.empty(tables, dtype=np.int64)
+        self.stacks = np.empty((tables, seats), dtype=np.int64)
+        self.bets = np.empty((tables, seats), dtype=np.int64)
+        self.contributions = np.empty((tables, seats), dtype=np.int64)
+        self.folded = np.empty((tables, seats), dtype=bool)
+        self.acted = np.empty((tables, seats), dtype=bool)
+        self.street = np.empty(tables, dtype=np.int64)
+        self.to_act = np.empty(tables, dtype=np.int64)
+        self.current_bet = np.empty(tables, dtype=np.int64)
+        self.min_raise = np.empty(tables, dtype=np.int64)
+        self.done = np.empty(tables, dtype=bool)
+        self.seat_order = np.arange(seats)
+
+    def reset(self):
+        """Deal a new hand at every table and post the blinds."""
+        tables, seats = self.num_tables, self.num_players
+        cards = deal_cards(self.rng, tables, 2 * seats + 5)
+        self.hole[:] = np.stack([cards[:, :seats], cards[:, seats:2 * seats]], axis=2)
+        self.board[:] = cards[:, 2 * seats:]
+        board_masks = CARD_BITS[self.board].sum(axis=1)
+        keys = CARD_RANK_KEYS[self.board].sum(axis=1)[:, None] + CARD_RANK_KEYS[self.hole].sum(axis=2)
+        nibbles = CARD_NIBBLES[self.board].sum(axis=1)[:, None] + CARD_NIBBLES[self.hole].sum(axis=2)
+        self.strengths[:] = table_strengths(
+            keys, nibbles, lambda rows: board_masks[rows[0]] + CARD_BITS[self.hole[rows]].sum(axis=1))
+
+        self.button[:] = (self.hands_dealt + np.arange(tables)) % seats
+        self.hands_dealt += 1
+        self.stacks[:] = self.stack
+        self.bets[:] = 0
+        self.contributions[:] = 0
+        self.folded[:] = False
+        self.acted[:] = False
+        self.street[:] = 0
+        self.done[:] = False
+        self.min_raise[:] = self.big_blind
+        self.current_bet[:] = self.big_blind
+
+        # Heads-up the button posts the small blind
+        small = self.button if seats == 2 else (self.button + 1) % seats
+        big = (small + 1) % seats
+        rows = np.arange(tables)
+        for seat, blind in ((small, self.small_blind), (big, self.big_blind)):
+            paid = np.minimum(blind, self.stacks[rows, seat])
+            self.stacks[rows, seat] -= paid
+            self.bets[rows, seat] += paid
+            self.contributions[rows, seat] += paid
+        self.next_actor(rows, big)
+
+    def next_actor(self, rows, after):
+        """Give the action to the next seat after `after` that still has to act, or end the round."""
+        needs = (~self.folded[rows] & (self.stacks[rows] > 0)
+                 & (~self.acted[rows] | (self.bets[rows] < self.current_bet[rows, None])))
+        distance = np.where(needs, (self.seat_order - after[:, None] - 1) % self.num_players, self.num_players)
+        seat = distance.argmin(axis=1)
+        # Once everyone else has folded nobody has to act
+        alone = (~self.folded[rows]).sum(axis=1) <= 1
+        waiting = (distance[np.arange(len(rows)), seat] < self.num_players) & ~alone
+        self.to_act[rows[waiting]] = seat[waiting]
+        if not waiting.all():
+            self.end_round(rows[~waiting])
+
+    def end_round(self, rows):
+        live = (~self.folded[rows]).sum(axis=1)
+        finished = (live <= 1) | (self.street[rows] == 3)
+        self.done[rows[finished]] = True
+        rows = rows[~finished]
+        if not rows.size:
+            return
+        self.street[rows] += 1
+        self.bets[rows] = 0
+        self.current_bet[rows] = 0
+        self.min_raise[rows] = self.big_blind
+        self.acted[rows] = False
+        # With at most one player left who has chips, the board just runs out
+        able = (~self.folded[rows] & (self.stacks[rows] > 0)).sum(axis=1)
+        if (able <= 1).any():
+            self.end_round(rows[able <= 1])
+        rows = rows[able > 1]
+        if rows.size:
+            self.next_actor(rows, self.button[rows])
+
+    def observe(self, rows, seat):
+        """What the seat to act at these tables can see."""
+        visible = STREET_CARDS[self.street[rows]]
+        board = np.where(np.arange(5) < visible[:, None], self.board[rows], NO_CARD).astype(np.uint8)
+        return {
+            "seat": seat, "hole": self.hole[rows, seat], "board": board, "street": self.street[rows],
+            "button": self.button[rows], "stack": self.stacks[rows, seat], "bet": self.bets[rows, seat],
+            "to_call": self.current_bet[rows] - self.bets[rows, seat],
+            "min_raise_to": self.current_bet[rows] + self.min_raise[rows],
+            "pot": self.contributions[rows].sum(axis=1), "bets": self.bets[rows],
+            "stacks": self.stacks[rows], "folded": self.folded[rows],
+        }
+
+    def act(self, rows, seat, actions, amounts):
+        """
+        Apply one action per table. Folding when there is nothing to call is a
+        check, raises are clipped to between a minimum raise and all in, and a
+        raise without chips beyond the call is a call.
+        """
+        seat_bets = self.bets[rows, seat]
+        stack = self.stacks[rows, seat]
+        current = self.current_bet[rows]
+        to_call = current - seat_bets
+        fold = (actions == FOLD) & (to_call > 0)
+        raising = (actions == RAISE) & (stack > to_call)
+        target = np.minimum(np.maximum(amounts, current + self.min_raise[rows]), seat_bets + stack)
+        paid = np.where(raising, target - seat_bets, np.minimum(to_call, stack))
+        paid[fold] = 0
+
+        self.stacks[rows, seat] -= paid
+        self.bets[rows, seat] += paid
+        self.contributions[rows, seat] += paid
+        self.folded[rows[fold], seat] = True
+
+        new_bet = seat_bets + paid
+        raised = new_bet > current
+        # Only a full raise reopens the betting for players who already acted
+        full = raised & (new_bet - current >= self.min_raise[rows])
+        self.min_raise[rows[full]] = (new_bet - current)[full]
+        self.acted[rows[full]] = False
+        self.current_bet[rows[raised]] = new_bet[raised]
+        self.acted[rows, seat] = True
+        self.next_actor(rows, np.full(len(rows), seat))
+
+    def step(self):
+        """Let every seat act once at each table waiting on it."""
+        for seat, policy in enumerate(self.policies):
+            rows = np.nonzero(~self.done & (self.to_act == seat))[0]
+            if rows.size:
+                actions, amounts = policy(self.observe(rows, seat))
+                self.act(rows, seat, np.asarray(actions), np.asarray(amounts))
+
+    def payoffs(self):
+        """
+        Chips each seat wins back, pots split among the best live hands.
+
+        Each distinct contribution level makes a side pot of what every player
+        put in up to it, contested by the live players who reached it.
+        """
+        contributions = self.contributions
+        live = ~self.folded
+        strengths = np.where(live, self.strengths.astype(np.int64), -1)
+        levels = np.sort(contributions, axis=1)
+        payouts = np.zeros(contributions.shape)
+        previous = np.zeros(self.num_tables, dtype=np.int64)
+        for level in levels.T:
+            layer = (np.minimum(contributions, level[:, None])
+                     - np.minimum(contributions, previous[:, None])).sum(axis=1)
+            eligible = live & (contributions >= level[:, None])
+            # Nobody live reached this level: it goes to the best live hands
+            eligible[~eligible.any(axis=1)] = live[~eligible.any(axis=1)]
+            best = np.where(eligible, strengths, -1).max(axis=1)
+            winners = eligible & (strengths == best[:, None])
+            payouts += winners * (layer / winners.sum(axis=1))[:, None]
+            previous = level
+        return payouts
+
+    def play(self, out=None):
+        """Play one hand at every table and return (or fill in) their outcome records."""
+        self.reset()
+        while not self.done.all():
+            self.step()
+        out = np.empty(self.num_tables, dtype=outcome_dtype(self.num_players)) if out is None else out
+        count = len(out)
+        payouts = self.payoffs()
+        out["hole"] = self.hole[:count]
+        out["board"] = self.board[:count]
+        out["button"] = self.button[:count]
+        out["strengths"] = self.strengths[:count]
+        out["folded"] = self.folded[:count]
+        out["contributions"] = self.contributions[:count]
+        out["payoffs"] = (payouts - self.contributions)[:count]
+        out["pot"] = self.contributions[:count].sum(axis=1)
+        out["street"] = self.street[:count]
+        out["showdown"] = ((~self.folded).sum(axis=1) > 1)[:count]
+        return out
+
+
+def self_play(num_hands, policies, num_tables=10_000, stack=200, small_blind=1, big_blind=2, seed=None):
+    """
+    Play num_hands hands between the policies, one per seat.
+
+    Returns one outcome record per hand (see outcome_dtype), including each
+    seat's net payoff in chips. stack is one size for every seat or one per
+    seat.
+    """
+    tables = SelfPlayTables(min(num_tables, num_hands), policies, stack, small_blind, big_blind, seed)
+    outcomes = np.empty(num_hands, dtype=outcome_dtype(len(policies)))
+    for start in range(0, num_hands, tables.num_tables):
+        tables.play(outcomes[start:start + tables.num_tables])
+    return outcomes
+
+
+# Example policies
+
+def check_call(observation):
+    """Never folds, never raises."""
+    rows = len(observation["stack"])
+    return np.full(rows, CALL), np.zeros(rows, dtype=np.int64)
+
+
+def random_policy(fold=0.2, raise_=0.2, seed=None):
+    """Folds, raises (between a minimum raise and a pot-sized one) or calls at random."""
+    rng = np.random.default_rng(seed)
+
+    def policy(observation):
+        rows = len(observation["stack"])
+        draw = rng.random(rows)
+        actions = np.where(draw < fold, FOLD, np.where(draw < fold + raise_, RAISE, CALL))
+        low = observation["min_raise_to"]
+        high = np.maximum(low, observation["bet"] + observation["to_call"] + observation["pot"])
+        return actions, rng.integers(low, high + 1)
+
+    return policy
+
+
+def visible_categories(observation):
+    """Category of each row's hole cards plus the board shown so far, -1 before the flop."""
+    hole, board = observation["hole"], observation["board"]
+    shown = board != NO_CARD
+    cards = np.where(shown, board, 0)
+    keys = CARD_RANK_KEYS[hole].sum(axis=1) + (CARD_RANK_KEYS[cards] * shown).sum(axis=1)
+    nibbles = CARD_NIBBLES[hole].sum(axis=1) + (CARD_NIBBLES[cards] * shown).sum(axis=1)
+    masks = CARD_BITS[hole].sum(axis=1) + (CARD_BITS[cards] * shown).sum(axis=1)
+    postflop = shown.any(axis=1)
+    categories = np.full(len(hole), -1, dtype=np.int64)
+    if postflop.any():
+        strengths = table_strengths(keys[postflop], nibbles[postflop], lambda rows: masks[postflop][rows])
+        categories[postflop] = CATEGORIES[strengths]
+    return categories
+
+
+def strength_policy(raise_with="Two Pair", call_with="Pair", raise_to=3):
+    """
+    Plays its cards: preflop it raises pairs and two Broadway cards and calls
+    with any card ten or higher, after the flop it raises with raise_with or
+    better and calls with call_with or better. Raises are raise_to times the
+    minimum raise.
+    """
+    raise_category, call_category = CATEGORY_INDEX[raise_with], CATEGORY_INDEX[call_with]
+
+    def policy(observation):
+        ranks = observation["hole"] % 13
+        high, low = ranks.max(axis=1), ranks.min(axis=1)
+        categories = visible_categories(observation)
+        preflop = categories < 0
+        strong = np.where(preflop, (high == low) | (low >= 8), categories >= raise_category)
+        playable = np.where(preflop, high >= 8, categories >= call_category)
+        actions = np.where(strong, RAISE, np.where(playable, CALL, FOLD))
+        return actions, observation["min_raise_to"] * raise_to
+
+    return policy
+
+
+if __name__ == "__main__":
+    policies = [strength_policy(), random_policy(seed=1), check_call, strength_policy("Straight", "Two Pair"),
+                random_policy(0.4, 0.1, seed=2), random_policy(0.3, 0.3, seed=3)]
+    start = time.perf_counter()
+    outcomes = self_play(200_000, policies, seed=0)
+    elapsed = time.perf_counter() - start
+    print(f"Played {len(outcomes)} hands in {elapsed:.2f}s ({len(outcomes) / elapsed * 3600:,.0f} hands/hour)")
+    for seat, winnings in enumerate(outcomes["payoffs"].mean(axis=0)):
+        print(f"Seat {seat + 1}: {winnings:+.3f} chips per hand")
+    for street, name in enumerate(STREET_NAMES):
+        ended = outcomes["street"] == street
+        print(f"Hands ending on the {name.lower()}: {ended.mean() * 100:.1f}%")
+    print(f"Showdowns: {outcomes['showdown'].mean() * 100:.1f}%")
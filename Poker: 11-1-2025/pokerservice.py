@@ -0,0 +1,234 @@
+import asyncio
+import json
+import socket
+import time
+from collections import deque
+
+import numpy as np
+
+from poker import HAND_NAMES
+from pokerbatch import evaluate_batch
+from pokerequity import as_cards, exact_equity, monte_carlo_equity
+
+# A local evaluation service, so short-lived tools don't each pay for
+# importing numpy and building the lookup tables.
+#
+# Clients connect over a Unix socket or localhost TCP and send one JSON
+# request per line, getting one JSON response per line back, tagged with the
+# request's "id" if it had one:
+#   {"op": "evaluate", "hands": ["AsKsQsJsTs2h3d", [0, 1, 2, 3, 4, 5, 6], ...]}
+#       -> {"strengths": [...], "categories": [...]}
+#   {"op": "equity", "hole_cards": ["AsAh", "KdKc"], "board": "", "exact": false, ...}
+#       -> the result of monte_carlo_equity() or exact_equity()
+#   {"op": "metrics"}
+#       -> latency and batch size statistics
+#
+# Evaluate requests are queued and the batcher takes everything that arrives
+# within max_wait of the first one (up to max_batch hands), scores it with a
+# single evaluate_batch() call and hands each request its slice. Equity
+# requests are already vectorized per request and run in worker threads.
+#
+# Metrics count every request and batch, but latency and batch size
+# statistics cover only the most recent window of each, so a long-running
+# service keeps a fixed amount of history.
+
+
+class Metrics:
+    def __init__(self, window=10_000):
+        self.window = window
+        self.latencies = {}
+        self.requests = {}
+        self.batch_sizes = deque(maxlen=window)
+        self.batches = 0
+        self.started = time.time()
+
+    def record_latency(self, op, seconds):
+        self.latencies.setdefault(op, deque(maxlen=self.window)).append(seconds)
+        self.requests[op] = self.requests.get(op, 0) + 1
+
+    def record_batch(self, hands, requests):
+        self.batch_sizes.append((hands, requests))
+        self.batches += 1
+
+    def summary(self):
+        latency = {}
+        for op, times in self.latencies.items():
+            times = np.array(times) * 1000
+            latency[op] = {"requests": self.requests[op], "mean_ms": float(times.mean()),
+                           "p50_ms": float(np.percentile(times, 50)),
+                           "p99_ms": float(np.percentile(times, 99)), "max_ms": float(times.max())}
+        batches = np.array(self.batch_sizes).reshape(-1, 2)
+        return {"uptime": time.time() - self.started, "latency": latency,
+                "batches": self.batches,
+                "mean_batch_hands": float(batches[:, 0].mean()) if len(batches) else 0.0,
+                "mean_batch_requests": float(batches[:, 1].mean()) if len(batches) else 0.0,
+                "max_batch_hands": int(batches[:, 0].max()) if len(batches) else 0}
+
+
+class EvaluationService:
+    def __init__(self, max_batch=100_000, max_wait=0.002):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.metrics = Metrics()
+        self.queue = None
+        self.batcher = None
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.batcher = asyncio.create_task(self.run_batcher())
+
+    async def stop(self):
+        if self.batcher is not None:
+            self.batcher.cancel()
+            try:
+                await self.batcher
+            except asyncio.CancelledError:
+                pass
+
+    async def evaluate(self, hands):
+        """Strengths and categories of some hands, scored in a batch with any other pending requests."""
+        hands = np.array([as_cards(hand) for hand in hands], dtype=np.int64)
+        if hands.ndim != 2 or not 5 <= hands.shape[1] <= 7:
+            raise ValueError("Hands must all have the same number of cards, 5 to 7")
+        if hands.size and (hands.min() < 0 or hands.max() > 51):
+            raise ValueError("Card ids run from 0 to 51")
+        if (np.diff(np.sort(hands, axis=1), axis=1) == 0).any():
+            raise ValueError("A card appears more than once in a hand")
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((hands, future))
+        return await future
+
+    async def run_batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self.queue.get()]
+            size = len(pending[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    pending.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+                size += len(pending[-1][0])
+            self.metrics.record_batch(size, len(pending))
+
+            # evaluate_batch wants one hand size per call
+            by_size = {}
+            for hands, future in pending:
+                by_size.setdefault(hands.shape[1], []).append((hands, future))
+            for group in by_size.values():
+                try:
+                    categories, strengths = evaluate_batch(np.concatenate([hands for hands, _ in group]))
+                except Exception as error:
+                    for _, future in group:
+                        if not future.done():
+                            future.set_exception(error)
+                    continue
+                start = 0
+                for hands, future in group:
+                    stop = start + len(hands)
+                    if not future.done():
+                        future.set_result({"strengths": strengths[start:stop].tolist(),
+                                           "categories": [HAND_NAMES[c] for c in categories[start:stop]]})
+                    start = stop
+
+    async def equity(self, request):
+        if request.get("exact"):
+            function, keys = exact_equity, ("board", "dead")
+        else:
+            function, keys = monte_carlo_equity, ("board", "dead", "tolerance", "confidence",
+                                                  "batch_size", "max_samples", "seed")
+        arguments = {key: request[key] for key in keys if key in request}
+        return await asyncio.to_thread(function, request["hole_cards"], **arguments)
+
+    async def handle(self, request):
+        start = time.perf_counter()
+        op = request.get("op")
+        if op == "evaluate":
+            result = await self.evaluate(request["hands"])
+        elif op == "equity":
+            result = await self.equity(request)
+        elif op == "metrics":
+            result = self.metrics.summary()
+        else:
+            raise ValueError(f"Unknown op {op!r}")
+        self.metrics.record_latency(op, time.perf_counter() - start)
+        return result
+
+    async def respond(self, line, writer, lock):
+        request = {}
+        try:
+            request = json.loads(line)
+            result = await self.handle(request)
+        except Exception as error:
+            result = {"error": f"{type(error).__name__}: {error}"}
+        if isinstance(request, dict) and "id" in request:
+            result["id"] = request["id"]
+        async with lock:
+            writer.write(json.dumps(result, default=to_json).encode() + b"\n")
+            await writer.drain()
+
+    async def client_connected(self, reader, writer):
+        # Requests on one connection are answered as they finish, so a slow
+        # equity request doesn't hold up evaluations behind it
+        lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(self.respond(line, writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+
+def to_json(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Can't serialize {type(value).__name__}")
+
+
+async def serve(host="127.0.0.1", port=8765, path=None, max_batch=100_000, max_wait=0.002, ready=None):
+    """
+    Run the service until cancelled.
+
+    Listens on the Unix socket at path if given, otherwise on host:port
+    (port 0 picks a free one). ready, an asyncio.Future, is given the service
+    and the address it listens on once it accepts connections.
+    """
+    service = EvaluationService(max_batch, max_wait)
+    await service.start()
+    if path is not None:
+        server = await asyncio.start_unix_server(service.client_connected, path)
+        address = path
+    else:
+        server = await asyncio.start_server(service.client_connected, host, port)
+        address = server.sockets[0].getsockname()[:2]
+    if ready is not None:
+        ready.set_result((service, address))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def request(message, address=("127.0.0.1", 8765)):
+    """Send one request to a running service and return its response. address is (host, port) or a socket path."""
+    family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+    with socket.socket(family, socket.SOCK_STREAM) as connection:
+        connection.connect(address)
+        connection.sendall(json.dumps(message).encode() + b"\n")
+        with connection.makefile("rb") as reply:
+            return json.loads(reply.readline())
+
+
+if __name__ == "__main__":
+    asyncio.run(serve())
@@ -326,26 +326,25 @@ def simulate_poker(num_players, debug=False, printer=False):
 
     return players, community, best_player, deck1
 
-from itertools import combinations
-
-def test_all_7_card_hands():
-    suits = ['♠', '♥', '♦', '♣']
-    ranks = ['2', '3', '4', '5', '6', '7', '8', '9', 'T', 'J', 'Q', 'K', 'A']
-    deck = [Card(suit, rank) for suit in suits for rank in ranks]
-
-    # Generate all possible 7-card combinations from the deck
-    all_hands = combinations(deck, 7)
-
-    # Test each combination
-    for hand_cards in all_hands:
-        test_hand = Hand()
-        test_hand.add_cards(hand_cards)
-        test_hand.sort()
-        quality, hand_type = test_hand.quality()
-
-        print(f"Hand: {test_hand.show_hand()}, Quality: {quality}, Type: {hand_type}")
+SUITS = ['♠', '♥', '♦', '♣']
+RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', 'T', 'J', 'Q', 'K', 'A']
+
+def quality_of(cards):
+    # Scores a tuple of card ids (suit * 13 + rank) with this file's Hand
+    test_hand = Hand()
+    test_hand.add_cards([Card(SUITS[card // 13], RANKS[card % 13]) for card in cards])
+    test_hand.sort()
+    return test_hand.quality()
+
+def test_all_7_card_hands(processes=None, hands_dir=None):
+    # Splits the hands across a process pool and checkpoints as it goes, see
+    # pokerenum.py. Pass hands_dir to also write out every hand as JSON lines.
+    from pokerenum import enumerate_all_hands, report
+    results = enumerate_all_hands(processes=processes, checkpoint="pokertest_checkpoint.json",
+                                  evaluator=quality_of, hands_dir=hands_dir)
+    report(results)
+    return results
 
 # Note: Running this function would take significant time and resources due to the large number of combinations
-test_all_7_card_hands()
-
-
+if __name__ == "__main__":
+    test_all_7_card_hands()
@@ -0,0 +1,66 @@
+import asyncio
+import json
+
+from pokerservice import serve
+
+# Runs the evaluation service on a free localhost port and talks to it over
+# real connections, so nothing but this process is needed.
+
+HANDS = [["AsKsQsJsTs2h3d"], ["2c3d4h5s6c8dKh"], ["AhAdAcKsKd2c3c"], ["7h8h9hThJh2s3s"]]
+
+
+async def send(address, message):
+    reader, writer = await asyncio.open_connection(*address)
+    writer.write(json.dumps(message).encode() + b"\n")
+    await writer.drain()
+    response = json.loads(await reader.readline())
+    writer.close()
+    await writer.wait_closed()
+    return response
+
+
+async def concurrent_evaluations():
+    ready = asyncio.get_running_loop().create_future()
+    server = asyncio.create_task(serve(port=0, max_wait=0.5, ready=ready))
+    service, address = await ready
+    try:
+        responses = await asyncio.gather(*(send(address, {"op": "evaluate", "hands": hands, "id": i})
+                                           for i, hands in enumerate(HANDS)))
+        metrics = await send(address, {"op": "metrics"})
+    finally:
+        server.cancel()
+        try:
+            await server
+        except asyncio.CancelledError:
+            pass
+    return responses, metrics
+
+
+def test_concurrent_evaluations_share_a_batch():
+    responses, metrics = asyncio.run(concurrent_evaluations())
+    assert [response["id"] for response in responses] == list(range(len(HANDS)))
+    assert [response["categories"] for response in responses] == [
+        ["Straight Flush"], ["Straight"], ["Full House"], ["Straight Flush"]]
+    assert metrics["batches"] == 1
+    assert metrics["mean_batch_requests"] == len(HANDS)
+    assert metrics["latency"]["evaluate"]["requests"] == len(HANDS)
+
+
+def test_bad_requests_get_errors():
+    async def run():
+        ready = asyncio.get_running_loop().create_future()
+        server = asyncio.create_task(serve(port=0, ready=ready))
+        _, address = await ready
+        try:
+            return await asyncio.gather(send(address, {"op": "evaluate", "hands": [[0, 0, 1, 2, 3]]}),
+                                        send(address, {"op": "nothing"}))
+        finally:
+            server.cancel()
+            try:
+                await server
+            except asyncio.CancelledError:
+                pass
+
+    duplicate, unknown = asyncio.run(run())
+    assert duplicate["error"].startswith("ValueError")
+    assert unknown["error"].startswith("ValueError")